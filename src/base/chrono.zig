@@ -8,3 +8,7 @@ pub fn now(io: Io) Io.Timestamp {
 pub fn secondsSince(io: Io, timestamp: Io.Timestamp) f32 {
     return @as(f32, @floatFromInt(timestamp.durationTo(now(io)).toMilliseconds())) / 1000.0;
 }
+
+pub fn nanosecondsSince(io: Io, timestamp: Io.Timestamp) u64 {
+    return @intCast(@max(timestamp.durationTo(now(io)).toNanoseconds(), 0));
+}
@@ -1,4 +1,5 @@
 const std = @import("std");
+const builtin = @import("builtin");
 const Allocator = std.mem.Allocator;
 const Atomic = std.atomic.Value;
 
@@ -43,6 +44,9 @@ pub const Pool = struct {
     running_parallel: bool = false,
     running_async: bool = false,
 
+    // Bit i allows the threads to run on CPU i, 0 does not restrict them. Only supported on Linux
+    affinity: u64 = 0,
+
     pub fn availableCores(request: i32) u32 {
         const available: u32 = @intCast(std.Thread.getCpuCount() catch 1);
 
@@ -55,16 +59,66 @@ pub const Pool = struct {
         return @min(available, @as(u32, @intCast(@max(request, 1))));
     }
 
+    // Like availableCores, but counts only the CPUs that are selected by affinity
+    pub fn affinityCores(affinity: u64, request: i32) u32 {
+        const cpus: u32 = @popCount(affinity);
+        if (0 == cpus) {
+            return availableCores(request);
+        }
+
+        const available = @min(cpus, availableCores(0));
+
+        if (request <= 0) {
+            return @intCast(@max(@as(i32, @intCast(available)) + request, 1));
+        }
+
+        return @min(available, @as(u32, @intCast(request)));
+    }
+
     pub fn configure(self: *Pool, alloc: Allocator, num_threads: u32) !void {
-        self.uniques = try alloc.alloc(Unique, num_threads);
+        try self.spawnUniques(alloc, num_threads);
 
-        for (self.uniques, 0..) |*u, i| {
+        self.asyncp.thread = try std.Thread.spawn(.{}, asyncLoop, .{ &self.asyncp, self.affinity });
+    }
+
+    // Changes the number of threads and their affinity, must not be called while a program is running.
+    // Memory that was allocated per thread, with numThreads(), has to be allocated again.
+    pub fn resize(self: *Pool, alloc: Allocator, num_threads: u32, affinity: u64) !void {
+        if (num_threads == self.uniques.len and affinity == self.affinity) {
+            return;
+        }
+
+        self.quitAll();
+        alloc.free(self.uniques);
+        self.uniques = &.{};
+
+        if (affinity != self.affinity) {
+            self.waitAsync();
+            self.quitAsync();
+
+            self.affinity = affinity;
+            self.asyncp = .{};
+            self.asyncp.thread = try std.Thread.spawn(.{}, asyncLoop, .{ &self.asyncp, affinity });
+        }
+
+        try self.spawnUniques(alloc, num_threads);
+    }
+
+    fn spawnUniques(self: *Pool, alloc: Allocator, num_threads: u32) !void {
+        const uniques = try alloc.alloc(Unique, num_threads);
+        self.uniques = uniques;
+
+        for (uniques, 0..) |*u, i| {
             // Initializing u first, seems to get rid of one data race
             u.* = .{};
-            u.thread = try std.Thread.spawn(.{}, loop, .{ self, @as(u32, @intCast(i)) });
+            u.thread = std.Thread.spawn(.{}, loop, .{ self, @as(u32, @intCast(i)) }) catch |err| {
+                self.uniques = uniques[0..i];
+                self.quitAll();
+                self.uniques = &.{};
+                alloc.free(uniques);
+                return err;
+            };
         }
-
-        self.asyncp.thread = try std.Thread.spawn(.{}, asyncLoop, .{&self.asyncp});
     }
 
     pub fn deinit(self: *Pool, alloc: Allocator) void {
@@ -205,7 +259,31 @@ pub const Pool = struct {
         }
     }
 
+    fn setAffinity(affinity: u64) void {
+        if (0 == affinity or .linux != builtin.os.tag) {
+            return;
+        }
+
+        const linux = std.os.linux;
+
+        var set: linux.cpu_set_t = @splat(0);
+
+        const word_bits = @bitSizeOf(usize);
+
+        var i: u32 = 0;
+        while (i < 64) : (i += 1) {
+            if (0 != (affinity >> @intCast(i)) & 1) {
+                set[i / word_bits] |= @as(usize, 1) << @intCast(i % word_bits);
+            }
+        }
+
+        // Not being able to pin the thread is not worth failing for
+        linux.sched_setaffinity(0, &set) catch {};
+    }
+
     fn loop(self: *Pool, id: u32) void {
+        setAffinity(self.affinity);
+
         var u = &self.uniques[id];
 
         while (true) {
@@ -232,7 +310,9 @@ pub const Pool = struct {
         }
     }
 
-    fn asyncLoop(self: *Async) void {
+    fn asyncLoop(self: *Async, affinity: u64) void {
+        setAffinity(affinity);
+
         while (true) {
             while (true) {
                 const signal = self.signal.load(.acquire);
@@ -33,6 +33,7 @@ import bpy
 
 from . import (
     engine,
+    properties,
     #version_update,
 )
 
@@ -56,11 +57,10 @@ class ZygRender(bpy.types.RenderEngine):
     # final render
     def update(self, data, depsgraph):
         print("update()")
+        # The scene is synced by render(), which waits for the engine to be free
         if not self.session:
             engine.create(self, data)
 
-        engine.reset(self, data, depsgraph)
-
     def render(self, depsgraph):
         engine.render(self, depsgraph)
 
@@ -78,15 +78,10 @@ class ZygRender(bpy.types.RenderEngine):
     # viewport render
     def view_update(self, context, depsgraph):
         print("view_update()")
-        if not self.session:
-            engine.create(self, data)
-
-        engine.reset(self, data, depsgraph)
-        # engine.sync(self, depsgraph, context.blend_data)
+        engine.view_update(self, context.blend_data, depsgraph)
 
     def view_draw(self, context, depsgraph):
-        print("view_draw()")
-        #engine.view_draw(self, depsgraph, context.region, context.space_data, context.region_data)
+        engine.view_draw(self, depsgraph, context)
 
     def update_script_node(self, node):
         print("update_script_node()")
@@ -94,7 +89,7 @@ class ZygRender(bpy.types.RenderEngine):
 
     def update_render_passes(self, scene, srl):
         print("update_render_passes()")
-        #engine.register_passes(self, scene, srl)
+        engine.register_passes(self, scene, srl)
 
 
 def engine_exit():
@@ -111,7 +106,7 @@ def register():
     from bpy.utils import register_class
     # from . import ui
     # from . import operators
-    # from . import properties
+    from . import properties
     # from . import presets
     import atexit
 
@@ -121,7 +116,7 @@ def register():
 
     engine.init()
 
-    # properties.register()
+    properties.register()
     # ui.register()
     # operators.register()
     # presets.register()
@@ -136,7 +131,7 @@ def unregister():
     from bpy.utils import unregister_class
     # from . import ui
     # from . import operators
-    # from . import properties
+    from . import properties
     # from . import presets
     import atexit
 
@@ -144,7 +139,7 @@ def unregister():
 
     # ui.unregister()
     # operators.unregister()
-    # properties.unregister()
+    properties.unregister()
     # presets.unregister()
 
     for cls in classes:
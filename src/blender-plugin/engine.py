@@ -2,40 +2,335 @@
 from __future__ import annotations 
 
 from typing import NamedTuple
+from collections import OrderedDict
+from operator import attrgetter
 from ctypes import *
-import platform
+import hashlib
+import itertools
+import threading
+import time
+import weakref
 import numpy as np
 
 import mathutils
 import math
 
+from . import zyg as capi
+from .session import Session, lock
+
 class Prop(NamedTuple):
     shape: int
-    material: c_uint
+    # One material per slot of the mesh, as expected by su_prop_create
+    materials: Array
+    # Material slots of the parts of the shape, only slots with visible triangles get one
+    parts: tuple = ()
+
+class SyncedObject(NamedTuple):
+    # What reset() created for a non-instanced object, so that sync() can update it in place
+    type: str
+    props: list
+    shape: int = -1
+    material: c_uint = None
+    materials: Array = None
+    parts: tuple = ()
+    light_type: str = None
 
 Transformation = c_float * 16
 
+# Seconds between polls of a render running on the session thread
+Progress_interval = 0.1
+
+# Renderer shapes used for the supported light types
+Light_shapes = {'POINT': 8, 'SUN': 4}
+
+class Pass(NamedTuple):
+    # A Blender render pass filled from one of the AOVs of the renderer
+    toggle: str
+    name: str
+    channels: int
+    chan_id: str
+    type: str
+    aov: str
+    aov_class: int
+
+# aov_class is the index in AovValue.Class of aov_value.zig
+Passes = (
+    Pass("use_pass_z", "Depth", 1, "Z", 'VALUE', "Depth", 1),
+    Pass("use_pass_normal", "Normal", 3, "XYZ", 'VECTOR', "ShadingNormal", 4),
+    Pass("use_pass_diffuse_color", "DiffCol", 3, "RGB", 'COLOR', "Albedo", 0),
+    Pass("use_pass_emit", "Emit", 3, "RGB", 'COLOR', "Emission", 6),
+    Pass("zyg.use_pass_convergence", "Convergence", 1, "X", 'VALUE', "Convergence", 9),
+)
+
+class CachedMesh:
+    def __init__(self, shape, parts, fingerprint, num_bytes, generation):
+        self.shape = shape
+        self.parts = parts
+        self.fingerprint = fingerprint
+        self.num_bytes = num_bytes
+        self.generation = generation
+
+class MeshCache:
+    # Remembers the shapes created with su_triangle_mesh_create, so that unchanged meshes
+    # are not exported again by the next reset().
+    # Entries are kept in least recently used order. An evicted shape is not released,
+    # instead its id is handed out again and the next su_triangle_mesh_create overwrites it.
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.free_ids = []
+        self.num_bytes = 0
+        self.generation = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.free_ids.clear()
+        self.num_bytes = 0
+
+    def begin_sync(self):
+        # Shapes touched during the current sync are referenced by props and must not be evicted
+        self.generation += 1
+
+    def get(self, key, fingerprint):
+        entry = self.entries.get(key)
+        if None == entry or entry.fingerprint != fingerprint:
+            return None
+
+        self.entries.move_to_end(key)
+        entry.generation = self.generation
+        return entry
+
+    def reserve_id(self, key):
+        # An outdated version of the same mesh is replaced in place
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.num_bytes -= entry.num_bytes
+            return entry.shape
+
+        if len(self.free_ids) > 0:
+            return self.free_ids.pop()
+
+        return -1
+
+    def release_id(self, id):
+        # Returns an id of reserve_id() that did not end up with a shape
+        if id >= 0:
+            self.free_ids.append(id)
+
+    def put(self, key, fingerprint, shape, parts, num_bytes, budget):
+        self.entries[key] = CachedMesh(shape, parts, fingerprint, num_bytes, self.generation)
+        self.num_bytes += num_bytes
+
+        if self.num_bytes <= budget:
+            return
+
+        for k in [k for k, e in self.entries.items() if e.generation != self.generation]:
+            entry = self.entries.pop(k)
+            self.num_bytes -= entry.num_bytes
+            self.free_ids.append(entry.shape)
+
+            if self.num_bytes <= budget:
+                break
+
+mesh_cache = MeshCache()
+
+# Buffers of the mesh that was last handed to su_triangle_mesh_create with asyncr set.
+# The renderer builds its BVH in the background and reads them until the next mesh is created
+# or rendering starts, both of which commit the pending mesh first.
+pending_upload = None
+
+class SubstituteDesc(capi.SubstituteDesc):
+    def create(self):
+        return zyg.su_substitute_material_create(-1, byref(self))
+
+    def update(self, material):
+        return zyg.su_substitute_material_update(material, byref(self))
+
+class LightDesc(capi.LightDesc):
+    def create(self):
+        return zyg.su_light_material_create(-1, byref(self))
+
+    def update(self, material):
+        return zyg.su_light_material_update(material, byref(self))
+
+def material_key(desc):
+    # Descriptions are either JSON strings or one of the structs above
+    if isinstance(desc, str):
+        data = desc.encode('utf-8')
+    else:
+        data = type(desc).__name__.encode('utf-8') + bytes(desc)
+
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class MaterialCache:
+    # Materials with identical descriptions share one renderer material, keyed by a hash of the description.
+    # A shared material must not be updated in place, that would change it for all of its users.
+    def __init__(self):
+        self.ids = {}
+        self.keys = {}
+        self.users = {}
+
+    def clear(self):
+        self.ids.clear()
+        self.keys.clear()
+        self.users.clear()
+
+    def begin_sync(self):
+        # The materials stay, but the props that used them are gone
+        self.users.clear()
+
+    def create(self, descs):
+        # Returns a material for each description, or None where the renderer rejected it.
+        # Structs are created directly, the JSON descriptions not seen before with a single su_material_create_batch.
+        materials = [None] * len(descs)
+        pending = {}
+
+        for i, desc in enumerate(descs):
+            key = material_key(desc)
+            material = self.ids.get(key)
+            if None != material:
+                materials[i] = material
+            elif key in pending:
+                pending[key][1].append(i)
+            elif isinstance(desc, str):
+                pending[key] = (desc.encode('utf-8'), [i])
+            else:
+                self.add(key, desc.create(), [i], materials)
+
+        if len(pending) > 0:
+            num_materials = len(pending)
+            strings = (c_char_p * num_materials)(*[p[0] for p in pending.values()])
+            ids = (c_int32 * num_materials)()
+
+            zyg.su_material_create_batch(num_materials, strings, ids)
+
+            for (key, (_, indices)), id in zip(pending.items(), ids):
+                self.add(key, id, indices, materials)
+
+        for material in materials:
+            if None != material:
+                self.users[material.value] = self.users.get(material.value, 0) + 1
+
+        return materials
+
+    def add(self, key, id, indices, materials):
+        if id < 0:
+            return
+
+        material = c_uint(id)
+        self.ids[key] = material
+        self.keys[id] = key
+
+        for i in indices:
+            materials[i] = material
+
+    def update(self, material, desc):
+        # Changes material to match the struct desc.
+        # Returns False if other users share the material and would see the change as well.
+        key = material_key(desc)
+        if self.keys.get(material.value) == key:
+            return True
+
+        if self.users.get(material.value, 0) > 1:
+            return False
+
+        previous = self.keys.pop(material.value, None)
+        if previous:
+            del self.ids[previous]
+
+        if key not in self.ids:
+            self.ids[key] = material
+            self.keys[material.value] = key
+
+        desc.update(material)
+        return True
+
+material_cache = MaterialCache()
+
+# Images by name, with what identifies their current content: (id, (filepath, size, channels))
+image_cache = {}
+
+# The loaded library, see init()
+library = None
+
+# The engine of the library, created by acquire()
+zyg = None
+
+# The thread count that zyg was last asked for, see configure_threads()
+num_threads = None
+
+# Counts the scenes that reset() built, a render engine whose generation differs no longer owns the scene
+scene_generation = 0
+
+# Sessions of all viewports, which a final render cancels before it takes over the engine
+viewports = weakref.WeakSet()
+
 def init():
     import bpy
     import os.path
 
-    global zyg
+    global library
     
     print("engine.init()")
-    path = os.path.dirname(__file__)
+    library = capi.load(os.path.dirname(__file__))
 
-    if platform.system() == "Windows":
-        zyg = CDLL(path + "/zyg.dll")
-    else:
-        zyg = CDLL(path + "/libzyg.so")
 
-        
 def exit():
+    global zyg
+    global pending_upload
+
     print("engine.exit()")
-        
+    with lock:
+        if None != zyg:
+            zyg.close()
+            zyg = None
+
+    mesh_cache.clear()
+    material_cache.clear()
+    image_cache.clear()
+    pending_upload = None
+
+def acquire():
+    # The engine is created once and then shared by all render engines of the Blender process.
+    # They only clear its scene, so threads, images, materials and meshes stay resident between renders.
+    # The caches above are per process as well, which is why there is only one engine.
+    # Viewports and final renders take turns on it, every call into it has to hold the lock of session.py.
+    global zyg
+    global num_threads
+
+    if None == zyg:
+        num_threads = default_threads()
+        zyg = capi.Engine(library, num_threads)
+
+def default_threads():
+    # One core stays free for the interface, unless Blender runs without one
+    import bpy
+
+    return 0 if bpy.app.background else -1
+
+def apply_settings(settings, view_layer):
+    # Everything that only depends on the render settings, so that sync() can apply edits without a reset()
+    configure_threads(settings)
+
+    zyg.su_sampler_create(settings.samples)
+    zyg.su_sampler_set_adaptive(settings.adaptive_threshold, settings.adaptive_min_samples)
+
+    create_aovs(view_layer)
+
+def configure_threads(settings):
+    # Resizing restarts the threads, so it only happens if the setting changed
+    global num_threads
+
+    request = settings.threads if 0 != settings.threads else default_threads()
+    if request != num_threads:
+        zyg.su_set_threads(request, 0)
+        num_threads = request
+
 def release(engine):
     print("engine.release()")
-    zyg.su_release()
+    if engine.session and engine.viewport:
+        engine.viewport.stop()
+        engine.viewport = None
+
     engine.session = None
 
 def create(engine, data):
@@ -44,23 +339,41 @@ def create(engine, data):
         return
 
     engine.session = 1
+    engine.viewport = None
+    engine.view = None
+    engine.view_buffer = None
+    engine.synced = False
+    engine.generation = None
+    engine.settings = None
     engine.props = {}
+    engine.objects = {}
     engine.materials = {}
-    zyg.su_init()
+    acquire()
 
 def reset(engine, data, depsgraph):
+    global scene_generation
+
     if not engine.session:
         return
     print("engine.reset()")
 
+    scene_generation += 1
+    engine.generation = scene_generation
+
     scene = depsgraph.scene
-    scale = scene.render.resolution_percentage / 100.0
-    size_x = int(scene.render.resolution_x * scale)
-    size_y = int(scene.render.resolution_y * scale)
+    engine.settings = scene.zyg
+    engine.props = {}
+    engine.objects = {}
+    engine.materials = {}
 
-    zyg.su_sampler_create(16)
-    
-    camera = zyg.su_perspective_camera_create(size_x, size_y)
+    zyg.su_scene_clear()
+
+    apply_settings(engine.settings, depsgraph.view_layer)
+
+    mesh_cache.begin_sync()
+    material_cache.begin_sync()
+
+    engine.camera = create_camera(scene)
 
     integrators_desc = """{
     "surface": {
@@ -70,7 +383,7 @@ def reset(engine, data, depsgraph):
     }
     }"""
 
-    zyg.su_integrators_create(c_char_p(integrators_desc.encode('utf-8')))
+    zyg.su_integrators_create(integrators_desc)
 
     material_a_desc = """{
     "rendering": {
@@ -83,7 +396,15 @@ def reset(engine, data, depsgraph):
     }
     }"""
 
-    material_a = c_uint(zyg.su_material_create(-1, c_char_p(material_a_desc.encode('utf-8'))));
+    material_a = material_cache.create([material_a_desc])[0]
+    engine.default_material = material_a
+
+    # Materials are created up front, so that the renderer can parse all of them at once
+    create_materials(engine, [id for id in depsgraph.ids if 'MATERIAL' == id.id_type])
+
+    # Instances are collected per prototype and created in one batch each at the end
+    instances = {}
+    lights = []
 
     for object_instance in depsgraph.object_instances:
         # This is an object which is being instanced.
@@ -93,87 +414,417 @@ def reset(engine, data, depsgraph):
         if not object_instance.is_instance:
             if obj.type == 'MESH':
                 prop = create_mesh(engine, obj, material_a)
-                create_prop(prop, object_instance)
+                mesh_instance = create_prop(prop, object_instance)
+
+                if None == prop:
+                    engine.objects[obj.name] = SyncedObject(obj.type, [])
+                else:
+                    engine.objects[obj.name] = SyncedObject(obj.type, [mesh_instance], prop.shape, materials=prop.materials,
+                                                                 parts=prop.parts)
 
             if obj.type == 'LIGHT':
-                material_pattern = """{{
-                "rendering": {{
-                "Light": {{
-                "emittance": {{
-                "quantity": "Radiant_intensity",
-                "spectrum":[{}, {}, {}],
-                "value": {}
-                }}}}}}}}"""
+                lights.append((obj, object_instance.matrix_world.copy()))
 
-                light = obj.data
-                if light.type == 'POINT':
-                    material_desc = material_pattern.format(light.color[0], light.color[1], light.color[2], light.energy)
+            if obj.type == 'CAMERA':
+                update_camera(engine, obj)
+                engine.objects[obj.name] = SyncedObject(obj.type, [engine.camera])
+        else:
+            # Instanced will additionally have fields like uv, random_id and others which are
+            # specific for instances. See Python API for DepsgraphObjectInstance for details,
+            #print(f"Instance of {obj.name} at {object_instance.matrix_world}")
+            batch = instances.get(obj.name)
+            if None == batch:
+                prop = engine.props.get(obj.name)
+                if None == prop:
+                    prop = create_mesh(engine, obj, material_a)
 
-                    material = c_uint(zyg.su_material_create(-1, c_char_p(material_desc.encode('utf-8'))));
+                batch = (prop, [])
+                instances[obj.name] = batch
 
-                    light_instance = zyg.su_prop_create(8, 1, byref(material))
-                    zyg.su_light_create(light_instance)
+            if batch[0]:
+                # The instance object is reused by the iterator, the matrix has to be copied
+                batch[1].append(object_instance.matrix_world.copy())
 
-                    radius = light.shadow_soft_size
-                    trafo = convert_pointlight_matrix(object_instance.matrix_world, radius)
-                    zyg.su_prop_set_transformation(light_instance, trafo)
-                    zyg.su_prop_set_visibility(light_instance, 0, 1, 0)
+    for prop, matrices in instances.values():
+        create_props(prop, matrices)
 
-                if light.type == 'SUN':
-                    material_desc = material_pattern.format(light.color[0], light.color[1], light.color[2], light.energy)
+    for (obj, _), synced in zip(lights, create_lights(lights)):
+        engine.objects[obj.name] = synced
 
-                    material = c_uint(zyg.su_material_create(-1, c_char_p(material_desc.encode('utf-8'))));
+    background = True
+    if background:
+        create_background(scene)
 
-                    light_instance = zyg.su_prop_create(4, 1, byref(material))
-                    zyg.su_light_create(light_instance)
+    engine.synced = True
 
-                    radius = light.angle / 2.0
-                    trafo = convert_dirlight_matrix(object_instance.matrix_world, radius)
-                    zyg.su_prop_set_transformation(light_instance, trafo)
-                    zyg.su_prop_set_visibility(light_instance, 0, 1, 0)
+def sync(engine, data, depsgraph):
+    # Only pushes what changed according to depsgraph.updates, instead of exporting everything again.
+    # Changes that add or remove props cannot be applied in place and fall back to a rebuild.
+    if not engine.session:
+        return
 
-            if obj.type == 'CAMERA':
-                zyg.su_camera_set_fov(c_float(obj.data.angle))
-                trafo = convert_camera_matrix(object_instance.matrix_world)
-                zyg.su_prop_set_transformation(camera, trafo)
-        else:
-            # Instanced will additionally have fields like uv, random_id and others which are
-            # specific for instances. See Python API for DepsgraphObjectInstance for details,
-            #print(f"Instance of {obj.name} at {object_instance.matrix_world}")
-            prop = engine.props.get(obj.name)
+    # Another render engine might have replaced the scene in the meantime
+    if not engine.synced or engine.generation != scene_generation:
+        reset(engine, data, depsgraph)
+        return
+
+    print("engine.sync()")
+
+    engine.settings = depsgraph.scene.zyg
+
+    for update in depsgraph.updates:
+        if not sync_update(engine, depsgraph, update):
+            print(f"engine.sync(): {update.id.name} requires a rebuild")
+            rebuild(engine, data, depsgraph)
+            return
+
+def rebuild(engine, data, depsgraph):
+    # Clears the scene and creates it again, unchanged meshes and materials are reused from the caches
+    reset(engine, data, depsgraph)
+
+def sync_update(engine, depsgraph, update):
+    id = update.id
+    id_type = id.id_type
+
+    if 'OBJECT' == id_type:
+        return sync_object(engine, id, update)
+
+    if 'MATERIAL' == id_type:
+        if update.is_updated_shading:
+            return update_material(engine, id)
+        return True
+
+    if 'LIGHT' == id_type:
+        for name, synced in engine.objects.items():
+            if 'LIGHT' == synced.type:
+                obj = depsgraph.objects.get(name)
+                if obj and obj.data.name == id.name and not sync_light(obj, synced):
+                    return False
+        return True
+
+    if 'SCENE' == id_type:
+        # Samples, adaptive sampling, threads or passes might have changed
+        apply_settings(id.zyg, depsgraph.view_layer)
+
+        # Resolution changes, creating the camera again also resets its field of view
+        create_camera(id)
+        if id.camera:
+            update_camera(engine, id.camera)
+        return True
+
+    # Collections change when objects are added, removed or hidden
+    if id_type in ('COLLECTION', 'WORLD'):
+        return False
+
+    return True
+
+def sync_object(engine, obj, update):
+    synced = engine.objects.get(obj.name)
+
+    # The instances are not tracked individually, so anything affecting them starts from scratch
+    if obj.is_instancer:
+        return not (update.is_updated_geometry or update.is_updated_transform)
+
+    if None == synced:
+        return obj.type not in ('MESH', 'LIGHT')
+
+    if 'MESH' == obj.type:
+        if update.is_updated_geometry:
+            # The mesh cache replaces the shape in place, so the props keep referencing the right id
+            prop = create_mesh(engine, obj, engine.default_material)
             if None == prop:
-                prop = create_mesh(engine, obj, material_a)
+                return 0 == len(synced.props)
 
-            create_prop(prop, object_instance)
+            # The props were created for the parts of the old shape, a different layout needs new ones
+            if (prop.shape != synced.shape or prop.parts != synced.parts or
+                    list(prop.materials) != list(synced.materials)):
+                return False
 
-    background = True
-    if background:
-        create_background(scene)
+        if update.is_updated_transform:
+            trafo = convert_matrix(obj.matrix_world)
+            for p in synced.props:
+                zyg.su_prop_set_transformation(p, trafo)
+
+        return True
+
+    if 'LIGHT' == obj.type:
+        if update.is_updated_geometry or update.is_updated_shading or update.is_updated_transform:
+            return sync_light(obj, synced)
+
+        return True
+
+    if 'CAMERA' == obj.type:
+        update_camera(engine, obj)
+
+    return True
 
 def render(engine, depsgraph):
+    import bpy
+
     if not engine.session:
         return
     print("engine.render()")
 
+    # The viewports pause until the final render is done, and then build their scene again
+    with lock:
+        for viewport in viewports:
+            viewport.cancel = True
+
+        sync(engine, bpy.data, depsgraph)
+        render_locked(engine, depsgraph)
+
+def render_locked(engine, depsgraph):
+    global pending_upload
+
     scene = depsgraph.scene
     scale = scene.render.resolution_percentage / 100.0
     size_x = int(scene.render.resolution_x * scale)
     size_y = int(scene.render.resolution_y * scale)
 
-    buf = np.empty((size_x * size_y, 4), dtype=np.float32)
-
-    zyg.su_render_frame(0)
-    zyg.su_resolve_frame_to_buffer(-1, size_x, size_y, buf.ctypes.data_as(POINTER(c_float)))
-
-    # zyg.su_resolve_frame(-1)
-    # zyg.su_copy_framebuffer(4, 4, size_x, size_y, buf.ctypes.data_as(POINTER(c_uint8)))
+    # With border rendering the RenderResult only covers the border
+    crop = border_crop(scene, size_x, size_y)
+    zyg.su_camera_set_crop(*crop)
 
     # Here we write the pixel values to the RenderResult
-    result = engine.begin_result(0, 0, size_x, size_y)
+    result = engine.begin_result(0, 0, crop[2] - crop[0], crop[3] - crop[1])
     layer = result.layers[0].passes["Combined"]
-    layer.rect = buf
+
+    # This thread holds the shared lock, so the session needs its own
+    session = Session(zyg, threading.RLock())
+
+    settings = scene.zyg
+    if settings.progressive:
+        render_progressive(engine, session, settings, result, layer, size_x, crop)
+    else:
+        session.render_frame(0)
+
+        while session.wait(Progress_interval):
+            engine.update_progress(session.progress())
+
+        zyg.su_resolve_frame(-1)
+
+        buf = framebuffer()
+        if None == buf:
+            engine.report({'ERROR'}, "Zyg: Could not read the framebuffer")
+        else:
+            layer.rect = crop_pixels(buf, size_x, crop)
+
+    resolve_passes(engine, result, enabled_passes(depsgraph.view_layer), size_x, size_y, crop)
+
     engine.end_result(result)
 
+    # Rendering committed the last mesh
+    pending_upload = None
+
+def render_progressive(engine, session, settings, result, layer, size_x, crop):
+    # The session accumulates samples in the background, while this thread shows intermediate images
+    # and decides when to stop.
+    num_samples = settings.samples
+    time_limit = settings.time_limit
+    update_interval = settings.update_interval
+
+    start = time.perf_counter()
+    last_update = start
+
+    session.restart(num_samples)
+
+    # Starting the frame sized the target, which is then resolved into and read in place
+    buf = framebuffer()
+    if None == buf:
+        session.stop()
+        engine.report({'ERROR'}, "Zyg: Could not read the framebuffer")
+        return
+
+    while session.wait(Progress_interval):
+        now = time.perf_counter()
+        elapsed = now - start
+
+        iteration = session.iteration
+        engine.update_progress(iteration / num_samples)
+        engine.update_stats("", f"Sample {iteration}/{num_samples}, {elapsed:.1f} s")
+
+        if engine.test_break():
+            break
+
+        if time_limit > 0.0 and elapsed >= time_limit:
+            break
+
+        if now - last_update >= update_interval:
+            with session.lock:
+                zyg.su_resolve_frame(-1)
+            layer.rect = crop_pixels(buf, size_x, crop)
+            engine.update_result(result)
+            last_update = now
+
+    session.stop()
+
+    zyg.su_resolve_frame(-1)
+    layer.rect = crop_pixels(buf, size_x, crop)
+
+def border_crop(scene, size_x, size_y):
+    # Pixel rectangle (x0, y0, x1, y1) of the border, rows count from the bottom like in Blender
+    render = scene.render
+    if not render.use_border:
+        return (0, 0, size_x, size_y)
+
+    return (int(render.border_min_x * size_x), int(render.border_min_y * size_y),
+            int(render.border_max_x * size_x), int(render.border_max_y * size_y))
+
+def crop_pixels(pixels, size_x, crop):
+    # The renderer resolves the whole frame, only the rows and columns of the crop are passed on
+    x0, y0, x1, y1 = crop
+    if 0 == x0 and 0 == y0 and size_x == x1 and len(pixels) == size_x * y1:
+        return pixels
+
+    return pixels.reshape(-1, size_x, pixels.shape[-1])[y0:y1, x0:x1].reshape(-1, pixels.shape[-1])
+
+def enabled_passes(view_layer):
+    return [p for p in Passes if attrgetter(p.toggle)(view_layer)]
+
+def register_passes(engine, scene, view_layer):
+    engine.register_pass(scene, view_layer, "Combined", 4, "RGBA", 'COLOR')
+
+    for p in enabled_passes(view_layer):
+        engine.register_pass(scene, view_layer, p.name, p.channels, p.chan_id, p.type)
+
+def create_aovs(view_layer):
+    # Every AOV is listed, so that the ones of passes that were turned off get disabled again
+    enabled = enabled_passes(view_layer)
+    aovs = ", ".join('"{}": {}'.format(p.aov, "true" if p in enabled else "false") for p in Passes)
+
+    zyg.su_aovs_create("{{{}}}".format(aovs))
+
+def resolve_passes(engine, result, passes, size_x, size_y, crop):
+    # All passes are resolved together into one buffer with a plane per pass
+    if 0 == len(passes):
+        return
+
+    num_pixels = size_x * size_y
+
+    Aovs = c_uint32 * len(passes)
+    aovs = Aovs(*[p.aov_class for p in passes])
+
+    planes = np.empty((len(passes), num_pixels, 4), dtype=np.float32)
+
+    try:
+        zyg.su_resolve_aovs_to_buffer(len(passes), aovs, size_x, size_y, planes)
+    except capi.Error as e:
+        engine.report({'ERROR'}, f"Zyg: Could not resolve the render passes ({e})")
+        return
+
+    layer = result.layers[0]
+    for p, plane in zip(passes, planes):
+        layer.passes[p.name].rect = crop_pixels(plane[:, :p.channels], size_x, crop)
+
+def framebuffer():
+    # NumPy view of the memory the renderer resolves into, valid until the next frame is started
+    Dimensions = c_int32 * 2
+    dimensions = Dimensions()
+    pixels = POINTER(c_float)()
+
+    try:
+        zyg.su_framebuffer(dimensions, byref(pixels))
+    except capi.Error:
+        return None
+
+    if not pixels:
+        return None
+
+    return np.ctypeslib.as_array(pixels, shape=(dimensions[0] * dimensions[1], 4))
+
+def view_update(engine, data, depsgraph):
+    # Accumulation restarts in view_draw(), which also has to set up the viewport camera first
+    if engine.viewport:
+        engine.viewport.stop()
+
+    create(engine, data)
+
+    # During a final render the scene is synced later by view_draw(), the interface must not block
+    if lock.acquire(blocking=False):
+        try:
+            sync(engine, data, depsgraph)
+        finally:
+            lock.release()
+    else:
+        engine.synced = False
+
+    if None == engine.viewport:
+        engine.viewport = Session(zyg)
+        viewports.add(engine.viewport)
+
+    engine.view = None
+
+def view_draw(engine, depsgraph, context):
+    if not engine.session or None == engine.viewport:
+        return
+
+    import gpu
+    from gpu_extras.presets import draw_texture_2d
+
+    scene = depsgraph.scene
+    region = context.region
+    width = region.width
+    height = region.height
+
+    num_floats = width * height * 4
+
+    # During a final render the last frame is shown again, until the engine is free
+    if not lock.acquire(blocking=False):
+        if None == engine.view_buffer or len(engine.view_buffer) != num_floats:
+            engine.tag_redraw()
+            return
+    else:
+        try:
+            if not engine.synced or engine.generation != scene_generation:
+                engine.viewport.stop()
+                reset(engine, context.blend_data, depsgraph)
+                engine.view = None
+
+            if update_view_camera(engine, region, context.region_data):
+                engine.viewport.restart(scene.zyg.viewport_samples)
+
+            # The frame is resolved straight into the memory that is uploaded to the texture
+            if None == engine.view_buffer or len(engine.view_buffer) != num_floats:
+                engine.view_buffer = gpu.types.Buffer('FLOAT', num_floats)
+
+            zyg.su_resolve_frame_to_buffer(-1, width, height, engine.view_buffer)
+        finally:
+            lock.release()
+
+    texture = gpu.types.GPUTexture((width, height), format='RGBA32F', data=engine.view_buffer)
+
+    gpu.state.blend_set('ALPHA_PREMULT')
+    engine.bind_display_space_shader(scene)
+    draw_texture_2d(texture, (0, 0), width, height)
+    engine.unbind_display_space_shader()
+    gpu.state.blend_set('NONE')
+
+    if engine.viewport.running() or engine.generation != scene_generation:
+        engine.tag_redraw()
+
+def update_view_camera(engine, region, region_data):
+    view = (region.width, region.height,
+            tuple(map(tuple, region_data.view_matrix)),
+            tuple(map(tuple, region_data.window_matrix)))
+
+    if view == engine.view:
+        return False
+
+    engine.view = view
+
+    if engine.viewport:
+        engine.viewport.stop()
+
+    zyg.su_perspective_camera_create(region.width, region.height)
+
+    fov = 2.0 * math.atan(1.0 / region_data.window_matrix[0][0])
+    zyg.su_camera_set_fov(fov)
+
+    trafo = convert_camera_matrix(region_data.view_matrix.inverted())
+    zyg.su_prop_set_transformation(engine.camera, trafo)
+
+    return True
+
 def render_frame_finish(engine):
     if not engine.session:
         return
@@ -186,10 +837,41 @@ def create_material(engine, bmaterial):
     if None == bmaterial:
         return None
 
+    create_materials(engine, [bmaterial])
+
+    return engine.materials.get(bmaterial.name)
+
+def create_materials(engine, bmaterials):
+    # Materials already known by name are skipped, the others are created together
+    names = []
+    descs = []
+    for bmaterial in bmaterials:
+        if bmaterial.name in engine.materials or bmaterial.name in names:
+            continue
+
+        params = principled_params(bmaterial)
+        if params:
+            names.append(bmaterial.name)
+            descs.append(substitute_desc(*params))
+        else:
+            print(f"{bmaterial}")
+
+    for name, material in zip(names, material_cache.create(descs)):
+        if None != material:
+            engine.materials[name] = material
+
+def update_material(engine, bmaterial):
     existing = engine.materials.get(bmaterial.name)
-    if existing:
-        return existing
+    if None == existing:
+        return True
+
+    params = principled_params(bmaterial)
+    if params:
+        return material_cache.update(existing, substitute_desc(*params))
 
+    return True
+
+def principled_params(bmaterial):
     tree = bmaterial.node_tree
     if tree:
         bsdf = tree.nodes.get("Principled BSDF")
@@ -202,12 +884,7 @@ def create_material(engine, bmaterial):
             specular = bsdf.inputs.get("Specular").default_value
             metallic = bsdf.inputs.get("Metallic").default_value
 
-            material_desc = create_substitute_desc(color, roughness, specular_to_ior(specular), metallic)
-            created = c_uint(zyg.su_material_create(-1, c_char_p(material_desc.encode('utf-8'))))
-            engine.materials[bmaterial.name] = created
-            return created
-
-    print(f"{bmaterial}")
+            return color, roughness, specular_to_ior(specular), metallic
 
     return None
 
@@ -228,124 +905,374 @@ def invisible_material_heuristic(bmaterial):
 
     return False
 
-def create_substitute_desc(color, roughness, ior, metallic):
-    return """{{
-    "rendering": {{
-    "Substitute": {{
-    "color": [{}, {}, {}],
-    "roughness": {},
-    "ior": {},
-    "metallic": {},
-    "two_sided": true
-    }}
-    }}
-    }}""".format(color[0], color[1], color[2], roughness, ior, metallic)
+def substitute_desc(color, roughness, ior, metallic):
+    return SubstituteDesc((c_float * 3)(color[0], color[1], color[2]), roughness, ior, metallic, 1)
+
+def light_desc(light):
+    return LightDesc((c_float * 3)(light.color[0], light.color[1], light.color[2]), light.energy, 0)
+
+def create_lights(lights):
+    # Lights of the same color and energy share their material
+    supported = [obj.data for obj, _ in lights if obj.data.type in Light_shapes]
+    materials = iter(material_cache.create([light_desc(light) for light in supported]))
+
+    synced = []
+    for obj, matrix_world in lights:
+        light = obj.data
+
+        shape = Light_shapes.get(light.type)
+        material = next(materials) if None != shape else None
+
+        if None == material:
+            synced.append(SyncedObject(obj.type, [], light_type=light.type))
+            continue
+
+        light_instance = zyg.su_prop_create(shape, 1, byref(material))
+        zyg.su_light_create(light_instance)
+
+        zyg.su_prop_set_transformation(light_instance, convert_light_matrix(light, matrix_world))
+        zyg.su_prop_set_visibility(light_instance, 0, 1, 0)
+
+        synced.append(SyncedObject(obj.type, [light_instance], material=material, light_type=light.type))
+
+    return synced
+
+def sync_light(obj, synced):
+    light = obj.data
+
+    if light.type != synced.light_type:
+        return False
+
+    if 0 == len(synced.props):
+        return True
+
+    if not material_cache.update(synced.material, light_desc(light)):
+        return False
+
+    zyg.su_prop_set_transformation(synced.props[0], convert_light_matrix(light, obj.matrix_world))
+
+    return True
+
+def create_camera(scene):
+    scale = scene.render.resolution_percentage / 100.0
+    size_x = int(scene.render.resolution_x * scale)
+    size_y = int(scene.render.resolution_y * scale)
+
+    return zyg.su_perspective_camera_create(size_x, size_y)
+
+def update_camera(engine, obj):
+    zyg.su_camera_set_fov(obj.data.angle)
+    trafo = convert_camera_matrix(obj.matrix_world)
+    zyg.su_prop_set_transformation(engine.camera, trafo)
 
 def create_mesh(engine, obj, default_material):
     mesh = obj.to_mesh()
 
+    slots = mesh.materials.values()
+
     materials = []
-    for m in mesh.materials.values():
+    for m in slots:
         mat = create_material(engine, m)
-        if mat:
-            materials.append(mat)
+        if None != mat:
+            materials.append(mat.value)
         else:
-            materials.append(default_material)
+            materials.append(default_material.value)
 
     if 0 == len(materials):
+        obj.to_mesh_clear()
         return None
 
-    if invisible_material_heuristic(mesh.materials.values()[0]):
+    # Triangles of invisible slots are left out of the shape
+    visible = np.array([not invisible_material_heuristic(m) for m in slots], dtype=bool)
+    if not visible.any():
+        obj.to_mesh_clear()
         return None
 
-    mesh.calc_loop_triangles()
+    weld = engine.settings.weld_vertices
+    with_uvs = None != mesh.uv_layers.active and any(uses_textures(m) for m in slots)
 
-    #   mesh.calc_tangents()
+    # The split normals are part of the fingerprint, so they are needed for cached meshes too
     mesh.calc_normals_split()
 
+    # Objects sharing a mesh can still export different shapes from it, depending on their materials
+    key = mesh_key(obj) + (with_uvs, visible.tobytes())
+    fingerprint = mesh_fingerprint(mesh, weld, with_uvs, visible)
+
+    cached = mesh_cache.get(key, fingerprint)
+    if None == cached:
+        id = mesh_cache.reserve_id(key)
+        zmesh, parts, num_bytes = export_mesh(obj, mesh, weld, with_uvs, visible, id)
+
+        if zmesh >= 0:
+            budget = engine.settings.mesh_cache_budget * 1024 * 1024
+            mesh_cache.put(key, fingerprint, zmesh, parts, num_bytes, budget)
+        else:
+            mesh_cache.release_id(id)
+    else:
+        zmesh, parts = cached.shape, cached.parts
+
+    obj.to_mesh_clear()
+
+    if zmesh < 0:
+        return None
+
+    Materials = c_uint32 * len(materials)
+    prop = Prop(zmesh, Materials(*materials), parts)
+    engine.props[obj.name] = prop
+    return prop
+
+def mesh_key(obj):
+    # Objects sharing a mesh datablock share the shape, unless modifiers make them differ
+    if len(obj.modifiers) > 0:
+        return (obj.data.name_full, obj.name_full)
+
+    return (obj.data.name_full, None)
+
+def uses_textures(bmaterial):
+    # Image textures and normal maps are looked up with texture coordinates
+    if None == bmaterial or None == bmaterial.node_tree:
+        return False
+
+    return any(n.type in ('TEX_IMAGE', 'NORMAL_MAP') for n in bmaterial.node_tree.nodes)
+
+def mesh_fingerprint(mesh, weld, with_uvs, visible):
+    # Only reads what is cheap to get in bulk, but enough to notice edits of geometry and shading
+    digest = hashlib.blake2b(digest_size=16)
+
+    counts = np.array([len(mesh.vertices), len(mesh.loops), len(mesh.polygons), weld, with_uvs], dtype=np.int64)
+    digest.update(counts)
+    digest.update(visible)
+
+    coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coordinates)
+    digest.update(coordinates)
+
+    vertex_indices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_indices)
+    digest.update(vertex_indices)
+
+    # Expects split normals to be calculated already. They depend on smooth shading, auto smooth,
+    # sharp edges and custom normals, which are not worth tracking one by one.
+    normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+    mesh.loops.foreach_get("normal", normals)
+    digest.update(normals)
+
+    slots = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", slots)
+    digest.update(slots)
+
+    uv_layer = mesh.uv_layers.active
+    if uv_layer:
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uvs)
+        digest.update(uvs)
+
+    return digest.digest()
+
+def export_mesh(obj, mesh, weld, with_uvs, visible, id):
+    # Returns the shape id together with the material slots of its parts and the number of bytes
+    # that were sent to the renderer.
+    # The BVH is built asynchronously, so the extraction of the next mesh overlaps with it.
+    global pending_upload
+
+    mesh.calc_loop_triangles()
+
+    indices, positions, normals, uvs = extract_mesh(mesh, weld, with_uvs)
+    indices, parts = sort_parts(mesh, indices, visible)
+
+    num_loops = len(mesh.loops)
+    num_triangles = len(indices) // 3
+    num_vertices = len(positions)
+
+    if weld:
+        vertex_bytes = positions.itemsize * (positions.shape[1] + normals.shape[1] + (uvs.shape[1] if with_uvs else 0))
+        saved = (num_loops - num_vertices) * vertex_bytes
+        ratio = num_loops / num_vertices if num_vertices > 0 else 1.0
+        print(f"{obj.name}: welded {num_loops} loops to {num_vertices} vertices ({ratio:.2f}:1, {saved / (1024 * 1024):.2f} MiB saved)")
+
+    vertex_stride = 3
+
+    # The renderer derives the tangent frame from normals and UVs, so tangents are not exported
+    uvs_stride = 2 if with_uvs else 0
+
+    try:
+        zmesh = zyg.su_triangle_mesh_create(id, len(parts) // 3, parts,
+                                            num_triangles, indices,
+                                            num_vertices,
+                                            positions, vertex_stride,
+                                            normals, vertex_stride,
+                                            None, 0,
+                                            uvs if with_uvs else None, uvs_stride,
+                                            True)
+    except capi.Error:
+        return -1, (), 0
+
+    # Creating this mesh committed the previous one, only the current buffers are still in use
+    pending_upload = (parts, indices, positions, normals, uvs)
+
+    num_bytes = indices.nbytes + positions.nbytes + normals.nbytes + (uvs.nbytes if with_uvs else 0)
+
+    return zmesh, tuple(parts[2::3].tolist()), num_bytes
+
+def extract_mesh(mesh, weld, with_uvs=False):
+    # Expects loop triangles and split normals to be calculated already.
+    # UVs of the active layer are only read with_uvs, otherwise None is returned for them.
+    # Everything is read in bulk with foreach_get, so no Python objects are created per element.
+    # The buffers are contiguous and can be handed to su_triangle_mesh_create as they are.
     num_triangles = len(mesh.loop_triangles)
     num_loops = len(mesh.loops)
+    num_vertices = len(mesh.vertices)
 
-    Indices = c_uint32 * (num_triangles * 3)
-    indices = Indices()
+    # foreach_get only takes the fast path for buffers matching the property type, hence int32
+    indices = np.empty(num_triangles * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", indices)
+    indices = indices.view(np.uint32)
 
-    i = 0
-    for t in mesh.loop_triangles:
-        for l in t.loops:
-            indices[i] = l
-            i += 1
+    vertex_indices = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_indices)
 
-    Vectors = c_float * (num_loops * 3)
+    coordinates = np.empty(num_vertices * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coordinates)
 
-    positions = Vectors()
-    normals = Vectors()
+    normals = np.empty((num_loops, 3), dtype=np.float32)
+    mesh.loops.foreach_get("normal", normals.ravel())
 
-    i = 0
-    for l in mesh.loops:
-        v = mesh.vertices[l.vertex_index]
-        positions[i * 3 + 0] = v.co[0]
-        positions[i * 3 + 1] = v.co[1]
-        positions[i * 3 + 2] = v.co[2]
+    uvs = None
+    uv_layer = mesh.uv_layers.active
+    if with_uvs and uv_layer:
+        uvs = np.empty((num_loops, 2), dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uvs.ravel())
 
-        normals[i * 3 + 0] = l.normal[0]
-        normals[i * 3 + 1] = l.normal[1]
-        normals[i * 3 + 2] = l.normal[2]
-        i += 1
+    if weld:
+        # Loops only need to agree on the attributes that are actually exported
+        first, remap = weld_loops(vertex_indices, normals, uvs)
 
-    vertex_stride = 3
+        indices = remap[indices]
+        vertex_indices = vertex_indices[first]
+        normals = normals[first]
 
-    obj.to_mesh_clear()
+        if uvs is not None:
+            uvs = uvs[first]
 
-    zmesh = zyg.su_triangle_mesh_create(-1, 0, None,
-                                        num_triangles, indices,
-                                        num_loops,
-                                        positions, vertex_stride,
-                                        normals, vertex_stride,
-                                        None, 0,
-                                        None, 0)
+    # One position per (welded) loop, gathered from the shared vertices
+    positions = coordinates.reshape(num_vertices, 3)[vertex_indices]
 
-    prop = Prop(zmesh, materials[0])
-    engine.props[obj.name] = prop
-    return prop
+    return indices, positions, normals, uvs
+
+def sort_parts(mesh, indices, visible):
+    # Orders the triangles by material slot, so that one shape with a part per slot carries all of them.
+    # Returns the indices together with the (start_index, num_indices, material_index) triplets of the parts.
+    num_slots = len(visible)
+
+    slots = np.empty(len(mesh.loop_triangles), dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", slots)
+
+    # Blender uses the last slot for indices beyond it
+    np.clip(slots, 0, num_slots - 1, out=slots)
+
+    triangles = indices.reshape(-1, 3)
+
+    keep = visible[slots]
+    if not keep.all():
+        triangles = triangles[keep]
+        slots = slots[keep]
+
+    if num_slots > 1:
+        order = np.argsort(slots, kind='stable')
+        triangles = triangles[order]
+
+    counts = np.bincount(slots, minlength=num_slots)
+    starts = np.cumsum(counts) - counts
+    used = np.flatnonzero(counts)
+
+    parts = np.column_stack((starts[used] * 3, counts[used] * 3, used)).astype(np.uint32)
+
+    return np.ascontiguousarray(triangles).ravel(), parts.ravel()
+
+def weld_loops(vertex_indices, normals, uvs):
+    # Loops are merged if they reference the same vertex and their attributes are bitwise identical.
+    # Each loop becomes one fixed size binary row, which np.unique can compare exactly.
+    columns = [vertex_indices.view(np.uint32).reshape(-1, 1), normals.view(np.uint32)]
+    if uvs is not None:
+        columns.append(uvs.view(np.uint32))
+
+    keys = np.ascontiguousarray(np.hstack(columns))
+    rows = keys.view(np.dtype((np.void, keys.itemsize * keys.shape[1]))).ravel()
+
+    _, first, remap = np.unique(rows, return_index=True, return_inverse=True)
+
+    # Keep the unique loops in their original order, which is friendlier to caches than sort order
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    return first[order], rank[remap.ravel()].astype(np.uint32)
 
 def create_prop(prop, object_instance):
     if None == prop:
-        return
+        return None
 
-    mesh_instance = zyg.su_prop_create(prop.shape, 1, byref(prop.material))
+    mesh_instance = zyg.su_prop_create(prop.shape, len(prop.materials), prop.materials)
     trafo = convert_matrix(object_instance.matrix_world)
     zyg.su_prop_set_transformation(mesh_instance, trafo)
+    return mesh_instance
 
-def create_background(scene):
-    if scene.world.node_tree:
-        nodes = scene.world.node_tree.nodes
-        hdri = nodes.get("World HDRI Tex")
-        if hdri:
-            image = hdri.image
+def create_props(prop, matrices):
+    if None == prop or 0 == len(matrices):
+        return None
 
-            nc = image.channels
-            num_pixels = image.size[0] * image.size[1]
+    trafos = convert_matrices(matrices)
 
-            pixels = image.pixels[:]
+    return zyg.su_prop_create_instances(prop.shape, len(prop.materials), prop.materials,
+                                        len(matrices), trafos)
 
-            Pixels = c_float * (num_pixels * 3)
-            image_buffer =  Pixels()
+def create_image(image):
+    # Images stay in the renderer, they are only uploaded again if they changed or were edited in Blender.
+    # Returns None if the renderer rejected the image.
+    signature = (image.filepath_raw, tuple(image.size), image.channels)
 
-            i = 0
-            while (i < num_pixels):
-                image_buffer[i * 3 + 0] = pixels[i * nc + 0]
-                image_buffer[i * 3 + 1] = pixels[i * nc + 1]
-                image_buffer[i * 3 + 2] = pixels[i * nc + 2]
-                i += 1
+    cached = image_cache.get(image.name_full)
+    if cached and cached[1] == signature and not image.is_dirty:
+        return cached[0]
 
-            pixel_type = 4
-            num_channels = 3
-            depth = 1
-            stride = 12
+    nc = image.channels
+    num_pixels = image.size[0] * image.size[1]
 
-            zimage = zyg.su_image_create(-1, pixel_type, num_channels, image.size[0], image.size[1], depth,
-                                         stride, image_buffer)
+    # Read in bulk, the renderer picks the RGB channels out of every pixel itself
+    pixels = np.empty(num_pixels * nc, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
 
+    pixel_type = 4
+    num_channels = 3
+    depth = 1
+    stride = nc * 4
+
+    # Grayscale images are spread over all three channels
+    Channels = c_uint32 * 3
+    channels = Channels(0, 1, 2) if nc >= 3 else Channels(0, 0, 0)
+
+    # An image that is already known is replaced in place and keeps its id
+    id = cached[0] if cached else -1
+
+    try:
+        zimage = zyg.su_image_create_channels(id, pixel_type, num_channels, image.size[0], image.size[1], depth,
+                                              stride, channels, pixels)
+    except capi.Error as e:
+        print(f"engine.create_image(): {image.name_full} failed with {e.code}")
+        return None
+
+    image_cache[image.name_full] = (zimage, signature)
+
+    return zimage
+
+def create_background(scene):
+    if scene.world.node_tree:
+        nodes = scene.world.node_tree.nodes
+        hdri = nodes.get("World HDRI Tex")
+        zimage = create_image(hdri.image) if hdri and hdri.image else None
+
+        # Without the image the plain world color is used instead
+        if None != zimage:
             material_desc = """{{
             "rendering": {{
             "Light": {{
@@ -357,13 +1284,14 @@ def create_background(scene):
             "value": 1
             }}}}}}}}""".format(zimage)
 
-            material = c_uint(zyg.su_material_create(-1, c_char_p(material_desc.encode('utf-8'))));
+            material = material_cache.create([material_desc])[0]
 
-            light_instance = zyg.su_prop_create(5, 1, byref(material))
-            zyg.su_prop_set_transformation(light_instance, environment_matrix())
-            zyg.su_light_create(light_instance)
+            if None != material:
+                light_instance = zyg.su_prop_create(5, 1, byref(material))
+                zyg.su_prop_set_transformation(light_instance, environment_matrix())
+                zyg.su_light_create(light_instance)
 
-            return
+                return
 
     color = scene.world.color;
 
@@ -374,7 +1302,9 @@ def create_background(scene):
     "spectrum": [{}, {}, {}]
     }}}}}}}}""".format(color[0], color[1], color[2])
 
-    material = c_uint(zyg.su_material_create(-1, c_char_p(material_desc.encode('utf-8'))));
+    material = material_cache.create([material_desc])[0]
+    if None == material:
+        return
 
     light_instance = zyg.su_prop_create(5, 1, byref(material))
     zyg.su_prop_set_transformation(light_instance, environment_matrix())
@@ -386,6 +1316,21 @@ def convert_matrix(m):
                           m[0][2], m[1][2], m[2][2], 0.0,
                           m[0][3], m[1][3], m[2][3], 1.0)
 
+def convert_matrices(matrices):
+    # Same layout as convert_matrix(), for a whole list of matrices at once.
+    # The rows are chained into one preallocated buffer, np.array() would inspect every element of every matrix.
+    num_matrices = len(matrices)
+    values = itertools.chain.from_iterable(itertools.chain.from_iterable(matrices))
+
+    m = np.fromiter(values, dtype=np.float32, count=num_matrices * 16).reshape(num_matrices, 4, 4)
+    return np.ascontiguousarray(m.transpose(0, 2, 1))
+
+def convert_light_matrix(light, m):
+    if light.type == 'SUN':
+        return convert_dirlight_matrix(m, light.angle / 2.0)
+
+    return convert_pointlight_matrix(m, light.shadow_soft_size)
+
 def convert_pointlight_matrix(m, s):
     return Transformation(s, 0.0, 0.0, 0.0,
                           0.0, s, 0.0, 0.0,
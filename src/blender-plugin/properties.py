@@ -0,0 +1,141 @@
+# <pep8 compliant>
+from __future__ import annotations
+
+import bpy
+from bpy.props import (
+    BoolProperty,
+    FloatProperty,
+    IntProperty,
+    PointerProperty,
+)
+
+
+class ZygRenderSettings(bpy.types.PropertyGroup):
+    samples: IntProperty(
+        name="Samples",
+        description="Number of samples to render for each pixel",
+        min=1,
+        default=16,
+    )
+
+    viewport_samples: IntProperty(
+        name="Viewport Samples",
+        description="Number of samples to render for each pixel in the viewport",
+        min=1,
+        default=1024,
+    )
+
+    progressive: BoolProperty(
+        name="Progressive",
+        description="Render a few samples at a time and show intermediate results",
+        default=True,
+    )
+
+    update_interval: FloatProperty(
+        name="Update Interval",
+        description="Seconds between intermediate results of progressive rendering",
+        min=0.0,
+        default=1.0,
+        subtype='TIME_ABSOLUTE',
+    )
+
+    time_limit: FloatProperty(
+        name="Time Limit",
+        description="Stop progressive rendering after this many seconds, 0 renders all samples",
+        min=0.0,
+        default=0.0,
+        subtype='TIME_ABSOLUTE',
+    )
+
+    adaptive_threshold: FloatProperty(
+        name="Adaptive Threshold",
+        description="Noise level below which pixels stop receiving samples during progressive rendering, 0 renders all samples everywhere",
+        min=0.0,
+        default=0.0,
+        precision=4,
+    )
+
+    adaptive_min_samples: IntProperty(
+        name="Adaptive Min Samples",
+        description="Number of samples every pixel receives before adaptive sampling can stop it",
+        min=2,
+        default=16,
+    )
+
+    threads: IntProperty(
+        name="Threads",
+        description="Number of render threads, 0 uses all cores but one while Blender shows its interface and all of them in background mode, "
+                    "negative values leave that many cores unused",
+        default=0,
+    )
+
+    weld_vertices: BoolProperty(
+        name="Weld Vertices",
+        description="Merge mesh corners that share position, normal and UV before sending them to the renderer",
+        default=True,
+    )
+
+    mesh_cache_budget: IntProperty(
+        name="Mesh Cache Budget",
+        description="Memory in MiB that meshes kept between renders may use before the least recently used are dropped",
+        min=0,
+        default=4096,
+        subtype='UNSIGNED',
+    )
+
+    @classmethod
+    def register(cls):
+        bpy.types.Scene.zyg = PointerProperty(
+            name="Zyg Render Settings",
+            description="Zyg render settings",
+            type=cls,
+        )
+
+    @classmethod
+    def unregister(cls):
+        del bpy.types.Scene.zyg
+
+
+def update_render_passes(self, context):
+    context.view_layer.update_render_passes()
+
+
+class ZygViewLayerSettings(bpy.types.PropertyGroup):
+    use_pass_convergence: BoolProperty(
+        name="Convergence",
+        description="Estimated relative error of each pixel, as used by adaptive sampling",
+        default=False,
+        update=update_render_passes,
+    )
+
+    @classmethod
+    def register(cls):
+        bpy.types.ViewLayer.zyg = PointerProperty(
+            name="Zyg View Layer Settings",
+            description="Zyg view layer settings",
+            type=cls,
+        )
+
+    @classmethod
+    def unregister(cls):
+        del bpy.types.ViewLayer.zyg
+
+
+classes = (
+    ZygRenderSettings,
+    ZygViewLayerSettings,
+)
+
+
+def register():
+    from bpy.utils import register_class
+
+    for cls in classes:
+        register_class(cls)
+
+
+def unregister():
+    from bpy.utils import unregister_class
+
+    for cls in classes:
+        unregister_class(cls)
@@ -0,0 +1,114 @@
+# <pep8 compliant>
+from __future__ import annotations
+
+from ctypes import c_uint32
+import threading
+import time
+
+from .zyg import Error
+
+# The renderer is not thread safe, so the sessions and every other call into it share this lock.
+# It is reentrant, so that restart() can be called by a thread that already holds it.
+lock = threading.RLock()
+
+
+class Session:
+    # Renders on a background thread, either a whole frame with su_render_frame or by accumulating
+    # samples with su_render_iterations in small steps. The calling thread stays free and polls.
+    # Every other call into the renderer has to hold the lock as well.
+    # The only exception is su_progress, which reads counters that are updated atomically.
+    # restart() and stop() may be called with the lock held, the thread gives up waiting for it once cancelled.
+
+    # Upper bound for a single step, so that stop() and resolving the frame never wait long
+    Step_duration = 0.05
+
+    def __init__(self, zyg, lock=lock):
+        self.zyg = zyg
+        self.lock = lock
+        self.thread = None
+        self.cancel = False
+        self.iteration = 0
+        self.num_samples = 0
+
+    def restart(self, num_samples):
+        self.stop()
+
+        with self.lock:
+            self.zyg.su_start_frame(0)
+
+        self.iteration = 0
+        self.num_samples = num_samples
+        self.cancel = False
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def render_frame(self, frame):
+        self.stop()
+
+        self.cancel = False
+
+        self.thread = threading.Thread(target=self.run_frame, args=(frame,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if None == self.thread:
+            return
+
+        self.cancel = True
+        self.thread.join()
+        self.thread = None
+
+    def running(self):
+        return None != self.thread and self.thread.is_alive()
+
+    def wait(self, timeout):
+        # Returns whether the thread is still running after at most timeout seconds
+        if None == self.thread:
+            return False
+
+        self.thread.join(timeout)
+        return self.thread.is_alive()
+
+    def progress(self):
+        # Fraction of the current render pass, as counted by the renderer
+        Progress = c_uint32 * 2
+        progress = Progress()
+        try:
+            self.zyg.su_progress(progress)
+        except Error:
+            return 0.0
+
+        if 0 == progress[1]:
+            return 0.0
+
+        return progress[0] / progress[1]
+
+    def run_frame(self, frame):
+        with self.lock:
+            self.zyg.su_render_frame(frame)
+
+    def run(self):
+        step = 1
+
+        while not self.cancel and self.iteration < self.num_samples:
+            step = min(step, self.num_samples - self.iteration)
+
+            # Someone else might hold the lock for long, e.g. a final render
+            if not self.lock.acquire(timeout=self.Step_duration):
+                continue
+
+            try:
+                if self.cancel:
+                    break
+
+                start = time.perf_counter()
+                self.zyg.su_render_iterations(step)
+                step_time = time.perf_counter() - start
+            finally:
+                self.lock.release()
+
+            self.iteration += step
+
+            if step_time > 0.0:
+                step = max(1, min(step * 2, int(step * self.Step_duration / step_time)))
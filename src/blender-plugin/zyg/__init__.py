@@ -0,0 +1,302 @@
+# <pep8 compliant>
+# Python binding of the su_* functions that capi.zig exports.
+# Every function gets its prototype declared, so that ctypes converts arguments without guessing,
+# and a negative return code raises Error instead of being passed on.
+#
+#   import zyg
+#   lib = zyg.load(path_to_the_library_folder)
+#   with zyg.Engine(lib) as engine:
+#       engine.su_mount(folder)
+#
+# Functions that work on an engine take its handle as first argument, Engine passes it on implicitly.
+#
+# Pointer parameters accept ctypes arrays, pointers and byref() as before,
+# but also NumPy arrays and other objects that support the buffer protocol, as long as they are contiguous.
+# They are never copied, the renderer works on their memory directly. Since it might write to it, or keep using it
+# after the call returned, read-only buffers like bytes are rejected.
+from __future__ import annotations
+
+from ctypes import *
+from ctypes import _Pointer
+import functools
+import os.path
+import platform
+
+
+class Error(Exception):
+    def __init__(self, function, code):
+        super().__init__(f"{function} returned {code}")
+        self.function = function
+        self.code = code
+
+
+class SubstituteDesc(Structure):
+    # Matches SubstituteDesc in capi.zig
+    _fields_ = [("color", c_float * 3),
+                ("roughness", c_float),
+                ("ior", c_float),
+                ("metallic", c_float),
+                ("two_sided", c_uint32)]
+
+
+class LightDesc(Structure):
+    # Matches LightDesc in capi.zig
+    _fields_ = [("spectrum", c_float * 3),
+                ("value", c_float),
+                ("two_sided", c_uint32)]
+
+
+class FrameStats(Structure):
+    # Matches FrameStats in capi.zig, times are in seconds
+    _fields_ = [("commit_time", c_double),
+                ("bvh_time", c_double),
+                ("light_time", c_double),
+                ("render_time", c_double),
+                ("iteration_time", c_double),
+                ("resolve_time", c_double),
+                ("num_iterations", c_uint32),
+                ("num_workers", c_uint32),
+                ("num_rays", c_uint64),
+                ("num_samples", c_uint64)]
+
+
+class WorkerStats(Structure):
+    # Matches WorkerStats in capi.zig
+    _fields_ = [("busy_time", c_double),
+                ("idle_time", c_double),
+                ("num_rays", c_uint64),
+                ("num_samples", c_uint64)]
+
+
+def _as_dict(struct):
+    return {name: getattr(struct, name) for name, _ in struct._fields_}
+
+
+LogFunc = CFUNCTYPE(None, c_uint, c_char_p)
+ProgressStartFunc = CFUNCTYPE(None, c_uint)
+ProgressTickFunc = CFUNCTYPE(None)
+
+_CArgObject = type(byref(c_int()))
+
+
+def _pointer(ctype):
+    # Parameter type for a pointer to ctype
+    Pointer = POINTER(ctype)
+
+    # Pointers to bytes take data of any type, e.g. the float pixels of an image
+    item_size = sizeof(ctype) if sizeof(ctype) > 1 else 0
+
+    class Param:
+        @classmethod
+        def from_param(cls, obj):
+            if None is obj:
+                return None
+
+            if isinstance(obj, (Array, _Pointer, _CArgObject)):
+                if 0 == item_size and not isinstance(obj, _CArgObject):
+                    return cast(obj, c_void_p)
+
+                return Pointer.from_param(obj)
+
+            interface = getattr(obj, "__array_interface__", None)
+            if None != interface:
+                # C-contiguous arrays have no strides, the address can be passed on without copying
+                if None != interface.get("strides"):
+                    raise TypeError(f"array is not contiguous, expected {Pointer.__name__}")
+
+                if 0 != item_size and int(interface["typestr"][2:]) != item_size:
+                    raise TypeError(f"array of {interface['typestr']}, expected {Pointer.__name__}")
+
+                if interface["data"][1]:
+                    raise TypeError(f"array is read-only, expected {Pointer.__name__}")
+
+                return c_void_p(interface["data"][0])
+
+            view = memoryview(obj)
+            if not view.contiguous:
+                raise TypeError(f"buffer is not contiguous, expected {Pointer.__name__}")
+
+            if 0 != item_size and view.itemsize != item_size:
+                raise TypeError(f"buffer of {view.format}, expected {Pointer.__name__}")
+
+            if view.readonly:
+                raise TypeError(f"buffer is read-only, expected {Pointer.__name__}")
+
+            return (c_char * view.nbytes).from_buffer(view)
+
+    Param.__name__ = f"{ctype.__name__}_pointer"
+
+    return Param
+
+
+class String:
+    # Accepts str, which is passed as UTF-8, in addition to bytes
+    @classmethod
+    def from_param(cls, obj):
+        if isinstance(obj, str):
+            obj = obj.encode('utf-8')
+
+        return c_char_p.from_param(obj)
+
+
+Bytes = _pointer(c_uint8)
+Floats = _pointer(c_float)
+Int32s = _pointer(c_int32)
+UInt32s = _pointer(c_uint32)
+
+Handle = c_void_p
+
+# Functions that do not take an engine handle
+Global_functions = ("su_init", "su_init_affinity", "su_register_log")
+
+Prototypes = {
+    "su_init": [c_int32, Handle],
+    "su_init_affinity": [c_int32, c_uint64, Handle],
+    "su_release": [],
+    "su_set_threads": [c_int32, c_uint64],
+    "su_num_threads": [],
+    "su_scene_clear": [],
+    "su_mount": [String],
+    "su_perspective_camera_create": [c_uint32, c_uint32],
+    "su_camera_set_fov": [c_float],
+    "su_camera_set_crop": [c_int32, c_int32, c_int32, c_int32],
+    "su_camera_sensor_dimensions": [Int32s],
+    "su_exporters_create": [String],
+    "su_aovs_create": [String],
+    "su_sampler_create": [c_uint32],
+    "su_sampler_set_adaptive": [c_float, c_uint32],
+    "su_integrators_create": [String],
+    "su_image_create": [c_uint32, c_uint32, c_uint32, c_uint32, c_uint32, c_uint32, c_uint32, Bytes],
+    "su_image_create_channels": [c_uint32, c_uint32, c_uint32, c_uint32, c_uint32, c_uint32, c_uint32, UInt32s, Bytes],
+    "su_image_update": [c_uint32, c_uint32, Bytes],
+    "su_image_update_channels": [c_uint32, c_uint32, UInt32s, Bytes],
+    "su_material_create": [c_uint32, String],
+    "su_material_create_batch": [c_uint32, POINTER(c_char_p), Int32s],
+    "su_material_update": [c_uint32, String],
+    "su_substitute_material_create": [c_uint32, POINTER(SubstituteDesc)],
+    "su_substitute_material_update": [c_uint32, POINTER(SubstituteDesc)],
+    "su_light_material_create": [c_uint32, POINTER(LightDesc)],
+    "su_light_material_update": [c_uint32, POINTER(LightDesc)],
+    "su_triangle_mesh_create": [c_uint32, c_uint32, UInt32s, c_uint32, UInt32s, c_uint32,
+                                Floats, c_uint32, Floats, c_uint32, Floats, c_uint32, Floats, c_uint32, c_bool],
+    "su_triangle_mesh_commit": [],
+    "su_prop_create": [c_uint32, c_uint32, UInt32s],
+    "su_prop_create_instance": [c_uint32],
+    "su_prop_create_instances": [c_uint32, c_uint32, UInt32s, c_uint32, Floats],
+    "su_light_create": [c_uint32],
+    "su_prop_set_transformation": [c_uint32, Floats],
+    "su_prop_set_transformation_frame": [c_uint32, c_uint32, Floats],
+    "su_prop_set_visibility": [c_uint32, c_uint32, c_uint32, c_uint32],
+    "su_render_frame": [c_uint32],
+    "su_export_frame": [],
+    "su_start_frame": [c_uint32],
+    "su_render_iterations": [c_uint32],
+    "su_resolve_frame": [c_uint32],
+    "su_resolve_frame_to_buffer": [c_uint32, c_uint32, c_uint32, Floats],
+    "su_resolve_aovs_to_buffer": [c_uint32, UInt32s, c_uint32, c_uint32, Floats],
+    "su_framebuffer": [Int32s, POINTER(POINTER(c_float))],
+    "su_copy_framebuffer": [c_uint32, c_uint32, c_uint32, c_uint32, Bytes],
+    "su_register_log": [LogFunc],
+    "su_register_progress": [ProgressStartFunc, ProgressTickFunc],
+    "su_progress": [UInt32s],
+    "su_frame_stats": [POINTER(FrameStats)],
+    "su_worker_stats": [c_uint32, POINTER(WorkerStats)],
+}
+
+
+def check(result, func, arguments):
+    if result < 0:
+        raise Error(func.__name__, result)
+
+    return result
+
+
+def library_name():
+    system = platform.system()
+    if "Windows" == system:
+        return "zyg.dll"
+
+    if "Darwin" == system:
+        return "libzyg.dylib"
+
+    return "libzyg.so"
+
+
+def check_handle(result, func, arguments):
+    if None == result:
+        raise Error(func.__name__, result)
+
+    return result
+
+
+def load(folder):
+    # Loads the library from folder and declares the prototypes of its functions
+    lib = CDLL(os.path.join(folder, library_name()))
+
+    for name, argtypes in Prototypes.items():
+        func = getattr(lib, name)
+
+        if name in ("su_init", "su_init_affinity"):
+            func.argtypes = argtypes
+            func.restype = Handle
+            func.errcheck = check_handle
+            continue
+
+        if name in Global_functions:
+            func.argtypes = argtypes
+        else:
+            func.argtypes = [Handle] + argtypes
+
+        func.restype = c_int32
+        func.errcheck = check
+
+    return lib
+
+
+class Engine:
+    # An independent scene and renderer of the library, released by close() or at the end of a with block.
+    # num_threads > 0 limits the number of render threads, num_threads <= 0 leaves that many cores unused.
+    # A non-zero affinity restricts the threads to the CPUs of its set bits, on Linux.
+    # With share set, the engine renders with the threads of another engine,
+    # in which case the two must not be called concurrently.
+
+    def __init__(self, lib, num_threads=0, affinity=0, share=None):
+        self.lib = lib
+        self.handle = lib.su_init_affinity(num_threads, affinity, None if None == share else share.handle)
+
+    def close(self):
+        if None == self.handle:
+            return
+
+        self.lib.su_release(self.handle)
+        self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stats(self):
+        # Counters of the last frame as a dict, with one dict per render thread in "workers"
+        frame = FrameStats()
+        self.su_frame_stats(byref(frame))
+
+        workers = (WorkerStats * frame.num_workers)()
+        self.su_worker_stats(frame.num_workers, workers)
+
+        stats = _as_dict(frame)
+        stats["workers"] = [_as_dict(w) for w in workers]
+        return stats
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not found otherwise, i.e. the functions of the library
+        func = getattr(self.lib, name)
+
+        if name in Global_functions or not name.startswith("su_"):
+            return func
+
+        if None == self.handle:
+            raise ValueError(f"{name} called on a released engine")
+
+        return functools.partial(func, self.handle)
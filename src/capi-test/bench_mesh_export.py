@@ -0,0 +1,101 @@
+# Compares the per-element mesh export with the bulk foreach_get export of the Blender plugin.
+# Has to run inside Blender:
+#   blender -b --factory-startup --python bench_mesh_export.py -- [subdivisions] [repetitions]
+
+from ctypes import *
+import importlib.util
+import os.path
+import sys
+import time
+
+import bpy
+
+# The plugin directory is not a valid module name, so it is loaded under another one
+plugin_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../blender-plugin")
+spec = importlib.util.spec_from_file_location("zyg_plugin", os.path.join(plugin_path, "__init__.py"),
+                                              submodule_search_locations=[plugin_path])
+plugin = importlib.util.module_from_spec(spec)
+sys.modules["zyg_plugin"] = plugin
+spec.loader.exec_module(plugin)
+
+engine = importlib.import_module("zyg_plugin.engine")
+
+def extract_mesh_per_element(mesh):
+    # The export as it was done before foreach_get, kept here as the reference
+    num_triangles = len(mesh.loop_triangles)
+    num_loops = len(mesh.loops)
+
+    Indices = c_uint32 * (num_triangles * 3)
+    indices = Indices()
+
+    i = 0
+    for t in mesh.loop_triangles:
+        for l in t.loops:
+            indices[i] = l
+            i += 1
+
+    Vectors = c_float * (num_loops * 3)
+
+    positions = Vectors()
+    normals = Vectors()
+
+    i = 0
+    for l in mesh.loops:
+        v = mesh.vertices[l.vertex_index]
+        positions[i * 3 + 0] = v.co[0]
+        positions[i * 3 + 1] = v.co[1]
+        positions[i * 3 + 2] = v.co[2]
+
+        normals[i * 3 + 0] = l.normal[0]
+        normals[i * 3 + 1] = l.normal[1]
+        normals[i * 3 + 2] = l.normal[2]
+        i += 1
+
+    return indices, positions, normals
+
+def create_test_mesh(subdivisions):
+    bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=subdivisions)
+    obj = bpy.context.active_object
+    bpy.ops.object.shade_smooth()
+    return obj
+
+def measure(func, mesh, repetitions):
+    best = float("inf")
+    result = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = func(mesh)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    subdivisions = int(argv[0]) if len(argv) > 0 else 7
+    repetitions = int(argv[1]) if len(argv) > 1 else 3
+
+    obj = create_test_mesh(subdivisions)
+    mesh = obj.to_mesh()
+    mesh.calc_loop_triangles()
+    mesh.calc_normals_split()
+
+    print("{} triangles, {} loops, {} vertices".format(len(mesh.loop_triangles), len(mesh.loops), len(mesh.vertices)))
+
+    bulk_time, bulk = measure(lambda m: engine.extract_mesh(m, False), mesh, repetitions)
+    weld_time, weld = measure(lambda m: engine.extract_mesh(m, True), mesh, repetitions)
+    element_time, element = measure(extract_mesh_per_element, mesh, repetitions)
+
+    import numpy as np
+
+    assert np.array_equal(bulk[0], np.ctypeslib.as_array(element[0]))
+    assert np.allclose(bulk[1].ravel(), np.ctypeslib.as_array(element[1]))
+    assert np.allclose(bulk[2].ravel(), np.ctypeslib.as_array(element[2]))
+
+    print("per element: {:.3f} s".format(element_time))
+    print("foreach_get: {:.3f} s".format(bulk_time))
+    print("speedup:     {:.1f}x".format(element_time / bulk_time))
+    print("welded:      {:.3f} s, {} vertices".format(weld_time, len(weld[1])))
+
+    obj.to_mesh_clear()
+
+main()
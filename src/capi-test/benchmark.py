@@ -0,0 +1,350 @@
+# Headless benchmark of the renderer through the C API, on procedurally generated scenes.
+#   python benchmark.py --library ../../zig-out/lib --output results.json
+#   python benchmark.py --library ../../zig-out/lib --baseline results.json
+# Every scene is built and rendered in a fresh engine at least --repetitions times, and as often as needed
+# for --min-duration seconds to pass. The fastest time of every phase is kept.
+# With --baseline the results are compared against an earlier run, and the exit code is 1 if a phase got slower
+# by more than --tolerance.
+
+from ctypes import *
+import argparse
+import json
+import math
+import os.path
+import platform
+import sys
+import time
+
+import numpy as np
+
+# The binding is part of the Blender plugin
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../blender-plugin"))
+import zyg as capi
+
+# Shapes that the renderer always provides, in the order of ShapeID in resource/manager.zig
+Canopy = 0
+Sphere = 6
+
+Scenes = {
+    "small": {"spheres": 16, "triangles": 10000, "instances": 16, "lights": 1, "hdri": 256,
+              "width": 320, "height": 180, "samples": 16, "iterations": 4},
+    "medium": {"spheres": 256, "triangles": 200000, "instances": 256, "lights": 8, "hdri": 1024,
+               "width": 640, "height": 360, "samples": 16, "iterations": 4},
+    "large": {"spheres": 4096, "triangles": 2000000, "instances": 4096, "lights": 64, "hdri": 2048,
+              "width": 1280, "height": 720, "samples": 16, "iterations": 4},
+}
+
+# Default of --min-duration, in seconds. Small scenes are repeated more often, which makes their timings less noisy.
+Min_duration = 1.0
+
+# Phases that got slower by less than this many seconds are too noisy to count as regressions
+Min_difference = 0.001
+
+Transformation = c_float * 16
+
+
+def translation(x, y, z, scale=1.0):
+    return Transformation(scale, 0.0, 0.0, 0.0,
+                          0.0, scale, 0.0, 0.0,
+                          0.0, 0.0, scale, 0.0,
+                          x, y, z, 1.0)
+
+
+def grid_positions(count, spacing, y):
+    # Positions on a square grid in the xz-plane, centered in front of the camera
+    side = max(1, math.ceil(math.sqrt(count)))
+    for i in range(count):
+        yield ((i % side) - 0.5 * (side - 1)) * spacing, y, 10.0 + (i // side) * spacing
+
+
+def generate_mesh(num_triangles):
+    # A wavy heightfield with at least num_triangles triangles, as the arrays that su_triangle_mesh_create expects
+    side = max(1, math.ceil(math.sqrt(num_triangles / 2)))
+
+    u = np.linspace(-1.0, 1.0, side + 1, dtype=np.float32)
+    x, z = np.meshgrid(u, u)
+    y = 0.05 * np.sin(8.0 * x) * np.cos(8.0 * z)
+
+    positions = np.ascontiguousarray(np.stack((x, y, z), axis=-1).reshape(-1, 3), dtype=np.float32)
+
+    normals = np.zeros_like(positions)
+    normals[:, 1] = 1.0
+
+    corners = np.arange((side + 1) * (side + 1), dtype=np.uint32).reshape(side + 1, side + 1)[:side, :side].ravel()
+    row = side + 1
+
+    indices = np.empty((len(corners), 6), dtype=np.uint32)
+    indices[:, 0] = corners
+    indices[:, 1] = corners + row
+    indices[:, 2] = corners + 1
+    indices[:, 3] = corners + 1
+    indices[:, 4] = corners + row
+    indices[:, 5] = corners + row + 1
+
+    return indices.ravel(), positions, normals
+
+
+def generate_hdri(size):
+    # An equirectangular sky gradient with a bright sun, size x size / 2 RGB pixels
+    width = size
+    height = max(1, size // 2)
+
+    v = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    u = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = 0.4 + 0.6 * (1.0 - v)
+    pixels[..., 1] = 0.6 + 0.4 * (1.0 - v)
+    pixels[..., 2] = 1.0 + 0.0 * u
+
+    sun = (np.abs(u - 0.25) < 0.01) & (np.abs(v - 0.3) < 0.02)
+    pixels[sun] = 200.0
+
+    return np.ascontiguousarray(pixels.ravel()), width, height
+
+
+class Timer:
+    def __init__(self):
+        self.timings = {}
+
+    def measure(self, phase, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[phase] = time.perf_counter() - start
+        return result
+
+
+def build_scene(zyg, config, timer):
+    zyg.su_sampler_create(config["samples"])
+
+    integrators_desc = """{
+    "surface": {
+    "PTMIS": {}
+    }
+    }"""
+
+    zyg.su_integrators_create(integrators_desc)
+
+    indices, positions, normals = generate_mesh(config["triangles"])
+    num_triangles = len(indices) // 3
+
+    Parts = c_uint32 * 3
+    parts = Parts(0, len(indices), 0)
+
+    def create_mesh(asyncr):
+        return zyg.su_triangle_mesh_create(-1, 1, parts, num_triangles, indices, len(positions),
+                                           positions, 3, normals, 3, None, 0, None, 0, asyncr)
+
+    # The asynchronous call returns once the data is copied and builds the BVH in the background
+    timer.measure("mesh_upload", create_mesh, True)
+    timer.measure("mesh_build", zyg.su_triangle_mesh_commit)
+
+    # The synchronous call does both, this is the mesh that gets used
+    mesh = timer.measure("mesh_create", create_mesh, False)
+
+    camera = zyg.su_perspective_camera_create(config["width"], config["height"])
+    zyg.su_prop_set_transformation(camera, translation(0.0, 2.0, 0.0))
+
+    def sync():
+        material = c_uint32(zyg.su_substitute_material_create(-1, byref(capi.SubstituteDesc(
+            (0.8, 0.6, 0.4), 0.3, 1.5, 0.0, 0))))
+
+        for x, y, z in grid_positions(config["spheres"], 1.5, 0.5):
+            sphere = zyg.su_prop_create(Sphere, 1, byref(material))
+            zyg.su_prop_set_transformation(sphere, translation(x, y, z, 0.5))
+
+        num_instances = config["instances"]
+        if num_instances > 0:
+            trafos = np.empty((num_instances, 16), dtype=np.float32)
+            for i, (x, y, z) in enumerate(grid_positions(num_instances, 2.5, 0.0)):
+                trafos[i] = translation(x, y, z)
+
+            zyg.su_prop_create_instances(mesh, 1, byref(material), num_instances, trafos)
+
+        light_material = c_uint32(zyg.su_light_material_create(-1, byref(capi.LightDesc(
+            (1.0, 1.0, 1.0), 100.0, 0))))
+
+        for x, y, z in grid_positions(config["lights"], 4.0, 6.0):
+            light = zyg.su_prop_create(Sphere, 1, byref(light_material))
+            zyg.su_prop_set_transformation(light, translation(x, y, z, 0.25))
+            zyg.su_light_create(light)
+
+    timer.measure("scene_sync", sync)
+
+    if config["hdri"] > 0:
+        pixels, width, height = generate_hdri(config["hdri"])
+
+        image = timer.measure("image_create", zyg.su_image_create, -1, 4, 3, width, height, 1, 12, pixels)
+
+        material_desc = """{{
+        "rendering": {{
+        "Light": {{
+        "emission": {{"id":{} }},
+        "emittance": {{
+        "quantity": "Radiance",
+        "spectrum": [1, 1, 1],
+        "value": 1
+        }}}}}}}}""".format(image)
+
+        material = c_uint32(zyg.su_material_create(-1, material_desc))
+
+        canopy = zyg.su_prop_create(Canopy, 1, byref(material))
+        zyg.su_light_create(canopy)
+
+
+def render(zyg, config, timer):
+    width = config["width"]
+    height = config["height"]
+
+    # The first frame also builds the top level BVH and the light tree
+    timer.measure("render_frame", zyg.su_render_frame, 0)
+
+    zyg.su_start_frame(0)
+
+    iterations = config["iterations"]
+    timer.measure("render_iterations", zyg.su_render_iterations, iterations)
+
+    planes = np.empty(width * height * 4, dtype=np.float32)
+    timer.measure("resolve", zyg.su_resolve_frame_to_buffer, -1, width, height, planes)
+
+    # su_copy_framebuffer reads the target of the renderer, which su_resolve_frame_to_buffer leaves untouched
+    zyg.su_resolve_frame(-1)
+
+    image = np.empty(width * height * 3, dtype=np.uint8)
+    timer.measure("copy_framebuffer", zyg.su_copy_framebuffer, 0, 3, width, height, image)
+
+
+def throughput(config, timings):
+    # Derived from the fastest times, so that runs on different scene sizes can be compared
+    pixels = config["width"] * config["height"]
+    samples = pixels * config["iterations"]
+
+    return {
+        "render_iterations_msamples_per_second": samples / max(timings["render_iterations"], 1e-9) * 1e-6,
+        "render_frame_msamples_per_second": pixels * config["samples"] / max(timings["render_frame"], 1e-9) * 1e-6,
+    }
+
+
+def run_scene(lib, config, repetitions, min_duration, num_threads):
+    best = {}
+    stats = None
+
+    start = time.perf_counter()
+    count = 0
+
+    while count < repetitions or time.perf_counter() - start < min_duration:
+        count += 1
+        timer = Timer()
+
+        with timer.measure("engine_init", capi.Engine, lib, num_threads) as zyg:
+            build_scene(zyg, config, timer)
+            render(zyg, config, timer)
+
+            # Of the progressive frame, the counters are informative and not compared against the baseline
+            stats = zyg.stats()
+
+        for phase, duration in timer.timings.items():
+            best[phase] = min(best.get(phase, float("inf")), duration)
+
+    return {"config": config, "repetitions": count, "timings": best, "throughput": throughput(config, best),
+            "stats": stats}
+
+
+def compare(results, baseline, tolerance):
+    # Returns the phases that got slower than the baseline allows, as (scene, phase, baseline, current)
+    regressions = []
+
+    for name, scene in results["scenes"].items():
+        reference = baseline.get("scenes", {}).get(name)
+        if None == reference:
+            print(f"{name}: not in baseline")
+            continue
+
+        if reference["config"] != scene["config"]:
+            print(f"{name}: configuration differs from baseline, skipped")
+            continue
+
+        for phase, current in scene["timings"].items():
+            previous = reference["timings"].get(phase)
+            if None == previous:
+                continue
+
+            ratio = current / previous if previous > 0.0 else 1.0
+            slower = current - previous > Min_difference and ratio > 1.0 + tolerance
+
+            print("{:8} {:20} {:10.4f} s {:10.4f} s {:+7.1f}%{}".format(
+                name, phase, previous, current, (ratio - 1.0) * 100.0, "  REGRESSION" if slower else ""))
+
+            if slower:
+                regressions.append((name, phase, previous, current))
+
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the renderer on procedural scenes")
+    parser.add_argument("--library", default=".", help="Folder that contains the zyg library")
+    parser.add_argument("--scene", action="append", choices=Scenes.keys(),
+                        help="Predefined scene to benchmark, can be repeated. Default is small and medium")
+    parser.add_argument("--custom", metavar="JSON",
+                        help="Additional scene, with keys overriding the small scene, e.g. '{\"triangles\": 500000}'")
+    parser.add_argument("--repetitions", type=int, default=3, help="Minimum number of runs per scene")
+    parser.add_argument("--min-duration", type=float, default=Min_duration,
+                        help="Repeat every scene until this many seconds have passed")
+    parser.add_argument("--threads", type=int, default=0, help="Render threads, as interpreted by su_init")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown relative to the baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    lib = capi.load(args.library)
+
+    scenes = {name: Scenes[name] for name in (args.scene or ["small", "medium"])}
+    if args.custom:
+        scenes["custom"] = dict(Scenes["small"], **json.loads(args.custom))
+
+    results = {
+        "system": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "threads": args.threads,
+        "repetitions": args.repetitions,
+        "min_duration": args.min_duration,
+        "scenes": {},
+    }
+
+    for name, config in scenes.items():
+        print(f"{name}: {config}")
+        results["scenes"][name] = run_scene(lib, config, max(args.repetitions, 1), args.min_duration, args.threads)
+
+        for phase, duration in results["scenes"][name]["timings"].items():
+            print("  {:20} {:10.4f} s".format(phase, duration))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline.get("threads") != results["threads"]:
+            print("Warning: baseline was measured with a different number of threads")
+
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} phases are slower than the baseline")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,11 @@
 from ctypes import *
-import platform
+import os.path
+import sys
+import threading
 
-LOG_FUNC = CFUNCTYPE(None, c_uint, c_char_p)
-
-PROGRESS_START_FUNC = CFUNCTYPE(None, c_uint)
-PROGRESS_TICK_FUNC = CFUNCTYPE(None)
+# The binding is part of the Blender plugin
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../blender-plugin"))
+import zyg as capi
 
 def py_log_callback(msg_type, msg):
     if 1 == msg_type:
@@ -14,54 +15,30 @@ def py_log_callback(msg_type, msg):
     else:
         print(str(msg, "utf-8"))
 
-class Progressor:
-    def start(self, resolution):
-        self.resolution = resolution
-        self.progress = 0
-        self.threshold = 1.0
-
-    def tick(self):
-        if self.progress >= self.resolution:
-            pass
-
-        self.progress += 1
-
-        p = float(self.progress) / float(self.resolution) * 100.0
-
-        if p >= self.threshold:
-            self.threshold += 1.0
-            print("{}%".format(int(p)), end = "\r")
-
-progress = Progressor()
-
-def py_progress_start(resolution):
-    global progress
-    progress.start(resolution)
+def render_frame(frame):
+    # Renders on another thread and polls the progress, instead of being called back for every tile
+    thread = threading.Thread(target=zyg.su_render_frame, args=(frame,))
+    thread.start()
 
-def py_progress_tick():
-    global progress
-    progress.tick()
-        
-if platform.system() == "Windows":
-    zyg = CDLL("./zyg.dll")
-elif platform.system() == "Darwin":
-    zyg = CDLL("./libzyg.dylib")
-else:
-    zyg = CDLL("./libzyg.so")
+    Progress = c_uint32 * 2
+    progress = Progress()
 
-logfunc = LOG_FUNC(py_log_callback)
+    while thread.is_alive():
+        thread.join(0.1)
+        zyg.su_progress(progress)
+        if progress[1] > 0:
+            print("{}%".format(int(100 * progress[0] / progress[1])), end = "\r")
 
-progstartfunc = PROGRESS_START_FUNC(py_progress_start)
-progtickfunc = PROGRESS_TICK_FUNC(py_progress_tick)
+lib = capi.load(".")
 
-zyg.su_register_log(logfunc)
+logfunc = capi.LogFunc(py_log_callback)
 
-zyg.su_init()
+lib.su_register_log(logfunc)
 
-zyg.su_register_progress(progstartfunc, progtickfunc)
+zyg = capi.Engine(lib)
 
 #print(zyg.su_mount(c_char_p(b"../../data/")))
-zyg.su_mount(c_char_p(b"/home/beni/workspace/sprout/system/../data/"))
+zyg.su_mount(b"/home/beni/workspace/sprout/system/../data/")
 
 camera = zyg.su_perspective_camera_create(1280, 720)
 
@@ -72,7 +49,7 @@ exporter_desc = """{
 }
 }"""
 
-zyg.su_exporters_create(c_char_p(exporter_desc.encode('utf-8')));
+zyg.su_exporters_create(exporter_desc);
 
 zyg.su_sampler_create(64)
 
@@ -84,7 +61,7 @@ integrators_desc = """{
 }
 }"""
 
-zyg.su_integrators_create(c_char_p(integrators_desc.encode('utf-8')))
+zyg.su_integrators_create(integrators_desc)
 
 material_a_desc = """{
 "rendering": {
@@ -96,7 +73,7 @@ material_a_desc = """{
 }
 }"""
 
-material_a = c_uint(zyg.su_material_create(-1, c_char_p(material_a_desc.encode('utf-8'))));
+material_a = c_uint(zyg.su_material_create(-1, material_a_desc));
 
 Buffer = c_float * 12
 
@@ -124,7 +101,7 @@ material_b_desc = """{{
 }}
 }}""".format(image_a)
 
-material_b = c_uint(zyg.su_material_create(-1, c_char_p(material_b_desc.encode('utf-8'))));
+material_b = c_uint(zyg.su_material_create(-1, material_b_desc));
 
 material_light_desc = """{
 "rendering": {
@@ -136,7 +113,7 @@ material_light_desc = """{
 }
 }"""
 
-material_light = c_uint(zyg.su_material_create(-1, c_char_p(material_light_desc.encode('utf-8'))));
+material_light = c_uint(zyg.su_material_create(-1, material_light_desc));
 
 sphere_a = zyg.su_prop_create(6, 1, byref(material_a))
 
@@ -245,8 +222,8 @@ transformation = Transformation(1.0, 0.0, 0.0, 0.0,
 
 zyg.su_prop_set_transformation_frame(triangle_a, 1, transformation)
 
-zyg.su_render_frame(0)
-zyg.su_export_frame(0)
+render_frame(0)
+zyg.su_export_frame()
 
 image_buffer = Buffer(0.0, 1.0, 0.0,
                       1.0, 0.0, 0.0,
@@ -255,7 +232,7 @@ image_buffer = Buffer(0.0, 1.0, 0.0,
 
 zyg.su_image_update(image_a, stride, image_buffer)
 
-zyg.su_render_frame(1)
-zyg.su_export_frame(1)
+render_frame(1)
+zyg.su_export_frame()
 
-zyg.su_release()
+zyg.close()
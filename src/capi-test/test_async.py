@@ -0,0 +1,56 @@
+# Creates images and materials right after a mesh whose BVH is still building in the background,
+# which is what the Blender plugin does when it uploads meshes with asyncr and then the world HDRI.
+#   python test_async.py [library folder]
+
+from ctypes import *
+import os.path
+import sys
+
+import numpy as np
+
+# The binding is part of the Blender plugin
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../blender-plugin"))
+import zyg as capi
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import generate_mesh, generate_hdri
+
+lib = capi.load(sys.argv[1] if len(sys.argv) > 1 else ".")
+
+with capi.Engine(lib) as zyg:
+    # Large enough that the build is still running when the next call arrives
+    indices, positions, normals = generate_mesh(2000000)
+
+    Parts = c_uint32 * 3
+    parts = Parts(0, len(indices), 0)
+
+    def create_mesh():
+        return zyg.su_triangle_mesh_create(-1, 1, parts, len(indices) // 3, indices, len(positions),
+                                           positions, 3, normals, 3, None, 0, None, 0, True)
+
+    pixels, width, height = generate_hdri(1024)
+
+    create_mesh()
+    image = zyg.su_image_create(-1, 4, 3, width, height, 1, 12, pixels)
+    assert image >= 0
+
+    create_mesh()
+    Channels = c_uint32 * 3
+    image = zyg.su_image_create_channels(-1, 4, 3, width, height, 1, 12, Channels(2, 1, 0), pixels)
+    assert image >= 0
+
+    create_mesh()
+    zyg.su_image_update(image, 12, pixels)
+
+    create_mesh()
+    zyg.su_image_update_channels(image, 12, Channels(0, 1, 2), pixels)
+
+    create_mesh()
+    material_desc = b'{"rendering": {"Substitute": {"color": [0.5, 0.5, 0.5]}}}'
+    Strings = c_char_p * 64
+    Ids = c_int32 * 64
+    ids = Ids()
+    assert 64 == zyg.su_material_create_batch(64, Strings(*([material_desc] * 64)), ids)
+    assert all(i >= 0 for i in ids)
+
+print("OK")
@@ -0,0 +1,97 @@
+# Renders the same scene once with materials created from the plain structs and once from JSON,
+# which have to give the same image. Both paths take sRGB colors and convert them to the working color space.
+#   python test_materials.py [library folder]
+
+from ctypes import *
+import os.path
+import sys
+
+import numpy as np
+
+# The binding is part of the Blender plugin
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../blender-plugin"))
+import zyg as capi
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import Canopy, Sphere, translation
+
+Width = 64
+Height = 64
+
+# Saturated, so that a missing color space conversion shows
+Color = (0.9, 0.2, 0.05)
+Roughness = 0.4
+Ior = 1.5
+Metallic = 0.0
+
+Spectrum = (0.2, 0.5, 1.0)
+Value = 2.0
+
+
+def substitute_json():
+    return """{{
+    "rendering": {{
+    "Substitute": {{
+    "color": [{}, {}, {}],
+    "roughness": {},
+    "ior": {},
+    "metallic": {}
+    }}}}}}""".format(*Color, Roughness, Ior, Metallic)
+
+
+def light_json():
+    return """{{
+    "rendering": {{
+    "Light": {{
+    "emittance": {{
+    "spectrum": [{}, {}, {}],
+    "value": {}
+    }}}}}}}}""".format(*Spectrum, Value)
+
+
+def render(zyg, from_structs):
+    zyg.su_scene_clear()
+
+    camera = zyg.su_perspective_camera_create(Width, Height)
+    zyg.su_prop_set_transformation(camera, translation(0.0, 0.0, 0.0))
+
+    if from_structs:
+        material = zyg.su_substitute_material_create(-1, byref(capi.SubstituteDesc(Color, Roughness, Ior, Metallic, 0)))
+        light_material = zyg.su_light_material_create(-1, byref(capi.LightDesc(Spectrum, Value, 0)))
+    else:
+        material = zyg.su_material_create(-1, substitute_json())
+        light_material = zyg.su_material_create(-1, light_json())
+
+    # The sphere covers the center of the image, the canopy lights it and is seen around it
+    sphere = zyg.su_prop_create(Sphere, 1, byref(c_uint32(material)))
+    zyg.su_prop_set_transformation(sphere, translation(0.0, 0.0, 3.0))
+
+    canopy = zyg.su_prop_create(Canopy, 1, byref(c_uint32(light_material)))
+    zyg.su_light_create(canopy)
+
+    zyg.su_render_frame(0)
+
+    pixels = np.empty((Height, Width, 4), dtype=np.float32)
+    zyg.su_resolve_frame_to_buffer(-1, Width, Height, pixels)
+
+    return pixels
+
+
+lib = capi.load(sys.argv[1] if len(sys.argv) > 1 else ".")
+
+with capi.Engine(lib) as zyg:
+    zyg.su_sampler_create(16)
+    zyg.su_integrators_create('{"surface": {"PTMIS": {}}}')
+
+    structs = render(zyg, True)
+    json = render(zyg, False)
+
+    center = (Height // 2, Width // 2)
+    corner = (0, 0)
+
+    # material.color shows on the sphere, emittance.value directly in the background
+    assert np.allclose(structs[center], json[center], rtol=1e-4, atol=1e-6), (structs[center], json[center])
+    assert np.allclose(structs[corner], json[corner], rtol=1e-4, atol=1e-6), (structs[corner], json[corner])
+    assert np.allclose(structs, json, rtol=1e-4, atol=1e-6)
+
+print("OK")
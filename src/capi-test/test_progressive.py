@@ -1,16 +1,15 @@
 from ctypes import *
-import platform
+import os.path
+import sys
 
 import matplotlib
 matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
-LOG_FUNC = CFUNCTYPE(None, c_uint, c_char_p)
-
-PROGRESS_START_FUNC = CFUNCTYPE(None, c_uint)
-
-PROGRESS_TICK_FUNC = CFUNCTYPE(None)
+# The binding is part of the Blender plugin
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../blender-plugin"))
+import zyg as capi
 
 def py_log_callback(msg_type, msg):
     if 1 == msg_type:
@@ -24,19 +23,16 @@ def py_progress_tick():
     print("Tick: ")
 
         
-if platform.system() == "Windows":
-    zyg = CDLL("./zyg.dll")
-else:
-    zyg = CDLL("./libzyg.so")
+lib = capi.load(".")
 
-logfunc = LOG_FUNC(py_log_callback)
+logfunc = capi.LogFunc(py_log_callback)
 
-zyg.su_register_log(logfunc)
+lib.su_register_log(logfunc)
 
-zyg.su_init()
+zyg = capi.Engine(lib)
 
 #print(zyg.su_mount(c_char_p(b"../../data/")))
-zyg.su_mount(c_char_p(b"/home/beni/workspace/sprout/system/../data/"))
+zyg.su_mount(b"/home/beni/workspace/sprout/system/../data/")
 
 zyg.su_sampler_create(4096)
 
@@ -48,7 +44,7 @@ integrators_desc = """{
 }
 }"""
 
-zyg.su_integrators_create(c_char_p(integrators_desc.encode('utf-8')))
+zyg.su_integrators_create(integrators_desc)
 
 Int2 = c_int32 * 2
 resolution = Int2()
@@ -62,17 +58,9 @@ camera = zyg.su_perspective_camera_create(resolution[0], resolution[1])
 
 roughness = 0.2
 
-material_a_desc = """{{
-"rendering": {{
-    "Substitute": {{
-        "color": [0, 1, 0.5],
-        "roughness": {},
-        "metallic": 0
-    }}
-}}
-}}""".format(roughness)
+material_a_desc = capi.SubstituteDesc((c_float * 3)(0.0, 1.0, 0.5), roughness, 1.46, 0.0, 0)
 
-material_a = c_uint(zyg.su_material_create(-1, c_char_p(material_a_desc.encode('utf-8'))))
+material_a = c_uint(zyg.su_substitute_material_create(-1, byref(material_a_desc)))
 
 material_b_desc = """{
 "rendering": {
@@ -87,14 +75,11 @@ material_b_desc = """{
 }
 }"""
 
-material_b = c_uint(zyg.su_material_create(-1, c_char_p(material_b_desc.encode('utf-8'))))
+material_b = c_uint(zyg.su_material_create(-1, material_b_desc))
 
 def updateRoughness():
-    material_desc = """{{
-        "roughness": {}
-    }}""".format(roughness)
-    
-    zyg.su_material_update(material_a, c_char_p(material_desc.encode('utf-8')))
+    material_a_desc.roughness = roughness
+    zyg.su_substitute_material_update(material_a, byref(material_a_desc))
 
 material_light_desc = """{
 "rendering": {
@@ -106,7 +91,7 @@ material_light_desc = """{
 }
 }"""
 
-material_light = c_uint(zyg.su_material_create(-1, c_char_p(material_light_desc.encode('utf-8'))))
+material_light = c_uint(zyg.su_material_create(-1, material_light_desc))
 
 sphere_a = zyg.su_prop_create(7, 1, byref(material_a))
 
@@ -239,7 +224,7 @@ def update(frame_number):
     frame_iteration += step
 
   #  if frame_iteration >= frame_next_display:
-    zyg.su_resolve_frame()
+    zyg.su_resolve_frame(-1)
     zyg.su_copy_framebuffer(0, 3, resolution[0], resolution[1], image)
 
     im.set_data(image)
@@ -300,4 +285,4 @@ fig.canvas.mpl_connect('key_press_event', press)
 
 plt.show()
 
-zyg.su_release()
+zyg.close()
@@ -9,11 +9,14 @@ const Scene = core.scene.Scene;
 const Shape = core.scene.Shape;
 const Take = core.take.Take;
 const prg = core.progress;
+const Texture = core.tx.Texture;
 
 const base = @import("base");
+const chrono = base.chrono;
 const math = base.math;
 const Vec2i = math.Vec2i;
 const Vec4i = math.Vec4i;
+const Vec4f = math.Vec4f;
 const Pack4f = math.Pack4f;
 const Mat3x3 = math.Mat3x3;
 const Mat4x4 = math.Mat4x4;
@@ -34,11 +37,41 @@ const Format = enum(u32) {
     Float32,
 };
 
+// A thread pool that several engines can use, it is released together with the last of them
+const SharedThreads = struct {
+    pool: Threads = .{},
+    users: std.atomic.Value(u32) = .init(1),
+
+    fn create(alloc: Allocator, num_threads: u32, affinity: u64) !*SharedThreads {
+        const self = try alloc.create(SharedThreads);
+        errdefer alloc.destroy(self);
+
+        self.* = .{ .pool = .{ .affinity = affinity } };
+        try self.pool.configure(alloc, num_threads);
+
+        return self;
+    }
+
+    fn acquire(self: *SharedThreads) *SharedThreads {
+        _ = self.users.fetchAdd(1, .monotonic);
+        return self;
+    }
+
+    fn release(self: *SharedThreads, alloc: Allocator) void {
+        if (1 == self.users.fetchSub(1, .acq_rel)) {
+            self.pool.deinit(alloc);
+            alloc.destroy(self);
+        }
+    }
+};
+
 const Engine = struct {
     alloc: Allocator,
-    io: Io,
+    threaded: std.Io.Threaded = .init_single_threaded,
+    io: Io = undefined,
 
-    threads: Threads = .{},
+    shared: *SharedThreads,
+    threads: *Threads,
 
     scene: Scene = undefined,
     resources: Resources = undefined,
@@ -50,190 +83,198 @@ const Engine = struct {
 
     frame: u32 = 0,
     iteration: u32 = 0,
-};
 
-var engine: ?Engine = null;
-
-export fn su_init() i32 {
-    if (engine) |_| {
-        return -1;
-    }
-
-    const alloc = std.heap.c_allocator;
-
-    var threaded: std.Io.Threaded = .init_single_threaded;
-    const io = threaded.io();
-
-    engine = .{ .alloc = alloc, .io = io };
+    fn create(alloc: Allocator, num_threads: i32, affinity: u64, share: ?*Engine) !*Engine {
+        const shared = if (share) |s| s.shared.acquire() else try SharedThreads.create(
+            alloc,
+            Threads.affinityCores(affinity, num_threads),
+            affinity,
+        );
+        errdefer shared.release(alloc);
 
-    if (engine) |*e| {
-        const num_workers = Threads.availableCores(0);
-        e.threads.configure(alloc, num_workers) catch {
-            //_ = err;
-            engine = null;
-            return -1;
-        };
+        // Resources, scene and driver keep pointers into the engine, so it must not move
+        const e = try alloc.create(Engine);
+        errdefer alloc.destroy(e);
 
-        e.resources = Resources.init(alloc, io, &e.threads) catch {
-            engine = null;
-            return -1;
-        };
+        e.* = .{ .alloc = alloc, .shared = shared, .threads = &shared.pool };
+        e.io = e.threaded.io();
 
-        const resources = &e.resources;
+        e.resources = try Resources.init(alloc, e.io, e.threads);
+        errdefer e.resources.deinit(alloc);
 
-        e.scene = Scene.init(alloc, resources) catch {
-            engine = null;
-            return -1;
-        };
+        e.scene = try Scene.init(alloc, &e.resources);
+        errdefer e.scene.deinit(alloc);
 
-        e.take.view.cameras.append(alloc, .{ .Perspective = .{} }) catch {
-            engine = null;
-            return -1;
-        };
+        errdefer e.take.deinit(alloc);
+        try e.take.view.cameras.append(alloc, .{ .Perspective = .{} });
 
-        e.fallback_material = resources.materials.store(
+        e.fallback_material = try e.resources.materials.store(
             alloc,
             Resources.Null,
             Resources.MaterialProvider.createFallbackMaterial(),
-        ) catch {
-            engine = null;
-            return -1;
-        };
+        );
 
         e.take.view.num_samples_per_pixel = 1;
 
-        e.driver = rendering.Driver.init(alloc, &e.threads, .{ .Null = {} }) catch {
-            engine = null;
-            return -1;
-        };
+        e.driver = try rendering.Driver.init(alloc, e.io, e.threads, .{ .Counter = .{} });
 
-        return 0;
+        return e;
     }
+};
 
-    return -1;
+// Creates an engine and returns the handle that all other functions take, or null if that failed.
+// num_threads > 0 limits the number of render threads, num_threads <= 0 leaves that many of the available cores unused.
+// With share set, the engine uses the threads of that engine instead of starting its own. Engines that share threads
+// must not be called concurrently, otherwise every engine is independent and can be used from its own thread.
+export fn su_init(num_threads: i32, share: ?*Engine) ?*Engine {
+    return Engine.create(std.heap.c_allocator, num_threads, 0, share) catch null;
 }
 
-export fn su_release() i32 {
-    if (engine) |*e| {
-        e.driver.deinit(e.alloc);
-        e.take.deinit(e.alloc);
-        e.materials.deinit(e.alloc);
-        e.resources.deinit(e.alloc);
-        e.scene.deinit(e.alloc);
-        e.threads.deinit(e.alloc);
-        engine = null;
-        return 0;
-    }
-
-    return -1;
+// Like su_init, but restricts the render threads to the CPUs selected by affinity, where bit i stands for CPU i.
+// num_threads then counts only those CPUs. An affinity of 0 does not restrict the threads.
+// Affinity is only supported on Linux and ignored elsewhere, it is also ignored together with num_threads if share is set.
+export fn su_init_affinity(num_threads: i32, affinity: u64, share: ?*Engine) ?*Engine {
+    return Engine.create(std.heap.c_allocator, num_threads, affinity, share) catch null;
 }
 
-export fn su_mount(folder: [*:0]const u8) i32 {
-    if (engine) |*e| {
-        e.resources.fs.pushMount(e.alloc, folder[0..std.mem.len(folder)]) catch {
-            return -1;
-        };
+// Changes the number of render threads and their affinity, as they are interpreted by su_init_affinity.
+// This affects all engines that share the threads, from their next su_render_frame or su_start_frame on.
+// Must not be called while any of them renders.
+export fn su_set_threads(e: *Engine, num_threads: i32, affinity: u64) i32 {
+    // A mesh created with asyncr might still be building
+    e.resources.commitAsync();
 
-        return 0;
-    }
+    e.threads.resize(e.alloc, Threads.affinityCores(affinity, num_threads), affinity) catch {
+        return -1;
+    };
 
-    return -1;
+    return 0;
 }
 
-export fn su_perspective_camera_create(width: u32, height: u32) i32 {
-    if (engine) |*e| {
-        const resolution = Vec2i{ @intCast(width), @intCast(height) };
-        const crop = Vec4i{ 0, 0, resolution[0], resolution[1] };
+export fn su_num_threads(e: *Engine) i32 {
+    return @intCast(e.threads.numThreads());
+}
 
-        var camera = &e.take.view.cameras.items[0];
+export fn su_release(e: *Engine) i32 {
+    const alloc = e.alloc;
 
-        camera.super().setResolution(resolution, crop);
-        camera.setFov(math.degreesToRadians(80.0));
+    // A mesh created with asyncr might still be building
+    e.resources.commitAsync();
 
-        if (Prop.Null == camera.super().entity) {
-            const prop_id = e.scene.createEntity(e.alloc) catch {
-                return -1;
-            };
+    e.driver.deinit(alloc);
+    e.take.deinit(alloc);
+    e.materials.deinit(alloc);
+    e.resources.deinit(alloc);
+    e.scene.deinit(alloc);
+    e.shared.release(alloc);
+    alloc.destroy(e);
+    return 0;
+}
 
-            camera.super().entity = prop_id;
-        }
+// Removes all props and lights, including the camera entity.
+// The thread pool, the driver and all resources stay resident, so images, materials and shapes
+// keep their ids and can be used by the props of the next scene.
+export fn su_scene_clear(e: *Engine) i32 {
+    e.resources.commitAsync();
 
-        e.scene.calculateNumInterpolationFrames(camera.super().frame_step, camera.super().frame_duration);
+    e.scene.clear();
 
-        return @intCast(camera.super().entity);
-    }
+    e.take.view.cameras.items[0].super().entity = Prop.Null;
 
-    return -1;
+    return 0;
 }
 
-export fn su_camera_set_fov(fov: f32) i32 {
-    if (engine) |*e| {
-        e.take.view.cameras.items[0].setFov(fov);
-        return 0;
-    }
+export fn su_mount(e: *Engine, folder: [*:0]const u8) i32 {
+    e.resources.fs.pushMount(e.alloc, folder[0..std.mem.len(folder)]) catch {
+        return -1;
+    };
 
-    return -1;
+    return 0;
 }
 
-export fn su_camera_sensor_dimensions(dimensions: [*]i32) i32 {
-    if (engine) |*e| {
-        const d = e.take.view.cameras.items[0].resolution();
-        dimensions[0] = d[0];
-        dimensions[1] = d[1];
-        return 0;
-    }
+export fn su_perspective_camera_create(e: *Engine, width: u32, height: u32) i32 {
+    const resolution = Vec2i{ @intCast(width), @intCast(height) };
+    const crop = Vec4i{ 0, 0, resolution[0], resolution[1] };
 
-    return -1;
-}
+    var camera = &e.take.view.cameras.items[0];
 
-export fn su_exporters_create(string: [*:0]const u8) i32 {
-    if (engine) |*e| {
-        var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
-        defer parsed.deinit();
+    camera.super().setResolution(resolution, crop);
+    camera.setFov(math.degreesToRadians(80.0));
 
-        e.take.loadExporters(e.alloc, parsed.value) catch return -1;
+    if (Prop.Null == camera.super().entity) {
+        const prop_id = e.scene.createEntity(e.alloc) catch {
+            return -1;
+        };
 
-        return 0;
+        camera.super().entity = prop_id;
     }
 
-    return -1;
+    e.scene.calculateNumInterpolationFrames(camera.super().frame_step, camera.super().frame_duration);
+
+    return @intCast(camera.super().entity);
 }
 
-export fn su_aovs_create(string: [*:0]const u8) i32 {
-    if (engine) |*e| {
-        var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
-        defer parsed.deinit();
+export fn su_camera_set_fov(e: *Engine, fov: f32) i32 {
+    e.take.view.cameras.items[0].setFov(fov);
+    return 0;
+}
 
-        e.take.view.loadAOV(parsed.value);
+export fn su_camera_set_crop(e: *Engine, x0: i32, y0: i32, x1: i32, y1: i32) i32 {
+    const camera = e.take.view.cameras.items[0].super();
 
-        return 0;
-    }
+    // Only pixels inside the crop window are rendered, the rest of the frame resolves to zero
+    camera.setResolution(camera.resolution, Vec4i{ x0, y0, x1, y1 });
+    return 0;
+}
 
-    return -1;
+export fn su_camera_sensor_dimensions(e: *Engine, dimensions: [*]i32) i32 {
+    const d = e.take.view.cameras.items[0].resolution();
+    dimensions[0] = d[0];
+    dimensions[1] = d[1];
+    return 0;
 }
 
-export fn su_sampler_create(num_samples: u32) i32 {
-    if (engine) |*e| {
-        e.take.view.num_samples_per_pixel = num_samples;
-    }
+export fn su_exporters_create(e: *Engine, string: [*:0]const u8) i32 {
+    var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
+    defer parsed.deinit();
 
-    return -1;
+    e.take.loadExporters(e.alloc, parsed.value) catch return -1;
+
+    return 0;
 }
 
-export fn su_integrators_create(string: [*:0]const u8) i32 {
-    if (engine) |*e| {
-        var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
-        defer parsed.deinit();
+export fn su_aovs_create(e: *Engine, string: [*:0]const u8) i32 {
+    var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
+    defer parsed.deinit();
 
-        e.take.view.loadIntegrators(parsed.value, &e.resources);
+    e.take.view.loadAOV(parsed.value);
 
-        return 0;
-    }
+    return 0;
+}
 
-    return -1;
+export fn su_sampler_create(e: *Engine, num_samples: u32) i32 {
+    e.take.view.num_samples_per_pixel = num_samples;
+    return 0;
+}
+
+// With a threshold > 0, su_render_iterations stops sampling tiles once the estimated relative error of all their pixels
+// is below it, but only after min_samples samples. The error estimate can be resolved as the Convergence AOV.
+export fn su_sampler_set_adaptive(e: *Engine, threshold: f32, min_samples: u32) i32 {
+    e.take.view.adaptive_settings = .{ .threshold = threshold, .min_samples = @max(min_samples, 2) };
+    return 0;
+}
+
+export fn su_integrators_create(e: *Engine, string: [*:0]const u8) i32 {
+    var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
+    defer parsed.deinit();
+
+    e.take.view.loadIntegrators(parsed.value, &e.resources);
+
+    return 0;
 }
 
 export fn su_image_create(
+    e: *Engine,
     id: u32,
     format: u32,
     num_channels: u32,
@@ -243,140 +284,417 @@ export fn su_image_create(
     pixel_stride: u32,
     data: [*]u8,
 ) i32 {
-    if (engine) |*e| {
-        const ef = @as(Format, @enumFromInt(format));
-        const bpc: u32 = switch (ef) {
-            .UInt8 => 1,
-            .UInt16, .Float16 => 2,
-            .UInt32, .Float32 => 4,
-        };
+    return su_image_create_channels(e, id, format, num_channels, width, height, depth, pixel_stride, null, data);
+}
 
-        const desc = img.Description.init3D(.{ @intCast(width), @intCast(height), @intCast(depth), 1 });
+// Like su_image_create, but channels[c] names the channel of a source pixel that ends up in channel c of the image.
+// Data is read as-is: pixel_stride bytes per pixel, without any padding between rows or slices.
+// UInt16 data is normalized and stored as Float32, as is Float16 data with 2 channels.
+export fn su_image_create_channels(
+    e: *Engine,
+    id: u32,
+    format: u32,
+    num_channels: u32,
+    width: u32,
+    height: u32,
+    depth: u32,
+    pixel_stride: u32,
+    channels: ?[*]const u32,
+    data: [*]const u8,
+) i32 {
+    // The pool can only run one program at a time, a mesh created with asyncr might still be building
+    e.resources.commitAsync();
 
-        const buffer = e.alloc.allocWithOptions(u8, bpc * num_channels * width * height * depth, .@"8", null) catch {
+    if (num_channels < 1 or num_channels > 4) {
+        return -1;
+    }
+
+    const ef = @as(Format, @enumFromInt(format));
+    const widen = switch (ef) {
+        .UInt16 => true,
+        .Float16 => 2 == num_channels,
+        else => false,
+    };
+
+    const bpc: u32 = if (widen) 4 else formatSize(ef);
+
+    const desc = img.Description.init3D(.{ @intCast(width), @intCast(height), @intCast(depth), 1 });
+
+    const num_pixels = img.Description.numPixels(desc.dimensions);
+
+    const buffer = e.alloc.allocWithOptions(u8, bpc * num_channels * num_pixels, .@"8", null) catch {
+        return -1;
+    };
+
+    const image: ?img.Image = switch (ef) {
+        .UInt8 => switch (num_channels) {
+            1 => img.Image{ .Byte1 = img.Byte1.initFromBytes(desc, buffer) },
+            2 => img.Image{ .Byte2 = img.Byte2.initFromBytes(desc, buffer) },
+            3 => img.Image{ .Byte3 = img.Byte3.initFromBytes(desc, buffer) },
+            else => img.Image{ .Byte4 = img.Byte4.initFromBytes(desc, buffer) },
+        },
+        .Float16 => switch (num_channels) {
+            1 => img.Image{ .Half1 = img.Half1.initFromBytes(desc, buffer) },
+            2 => img.Image{ .Float2 = img.Float2.initFromBytes(desc, buffer) },
+            3 => img.Image{ .Half3 = img.Half3.initFromBytes(desc, buffer) },
+            else => img.Image{ .Half4 = img.Half4.initFromBytes(desc, buffer) },
+        },
+        .UInt16, .Float32 => switch (num_channels) {
+            1 => img.Image{ .Float1 = img.Float1.initFromBytes(desc, buffer) },
+            2 => img.Image{ .Float2 = img.Float2.initFromBytes(desc, buffer) },
+            3 => img.Image{ .Float3 = img.Float3.initFromBytes(desc, buffer) },
+            else => img.Image{ .Float4 = img.Float4.initFromBytes(desc, buffer) },
+        },
+        .UInt32 => null,
+    };
+
+    if (image) |i| {
+        if (!copyImage(e, ef, widen, num_channels, pixel_stride, channels, width, height * depth, data, buffer)) {
+            e.alloc.free(buffer);
+            return -1;
+        }
+
+        const image_id = e.resources.images.store(e.alloc, id, i) catch {
+            e.alloc.free(buffer);
             return -1;
         };
+        return @as(i32, @intCast(image_id));
+    }
+
+    e.alloc.free(buffer);
 
-        const bpp = bpc * num_channels;
+    return -1;
+}
 
-        const num_pixels = img.Description.numPixels(desc.dimensions);
+export fn su_image_update(e: *Engine, id: u32, pixel_stride: u32, data: [*]u8) i32 {
+    return su_image_update_channels(e, id, pixel_stride, null, data);
+}
 
-        if (bpp == pixel_stride) {
-            @memcpy(buffer, data[0 .. num_pixels * bpp]);
-        }
+// The source format is implied by the image: UInt8 for Byte, Float16 for Half and Float32 for Float images.
+// Images that were widened to Float32 on creation are updated from Float32 data as well.
+export fn su_image_update_channels(e: *Engine, id: u32, pixel_stride: u32, channels: ?[*]const u32, data: [*]const u8) i32 {
+    // See su_image_create_channels
+    e.resources.commitAsync();
+
+    if (e.resources.images.get(id)) |image| {
+        const format: Format = switch (image.*) {
+            .Byte1, .Byte2, .Byte3, .Byte4 => .UInt8,
+            .Half1, .Half3, .Half4 => .Float16,
+            .Float1, .Float1Sparse, .Float2, .Float3, .Float4 => .Float32,
+        };
 
-        const image: ?img.Image = switch (ef) {
-            .UInt8 => switch (num_channels) {
-                1 => img.Image{ .Byte1 = img.Byte1.initFromBytes(desc, buffer) },
-                2 => img.Image{ .Byte2 = img.Byte2.initFromBytes(desc, buffer) },
-                3 => img.Image{ .Byte3 = img.Byte3.initFromBytes(desc, buffer) },
-                else => null,
-            },
-            .Float32 => switch (num_channels) {
-                1 => img.Image{ .Float1 = img.Float1.initFromBytes(desc, buffer) },
-                2 => img.Image{ .Float2 = img.Float2.initFromBytes(desc, buffer) },
-                3 => img.Image{ .Float3 = img.Float3.initFromBytes(desc, buffer) },
-                4 => img.Image{ .Float4 = img.Float4.initFromBytes(desc, buffer) },
-                else => null,
-            },
-            else => null,
+        const num_channels: u32 = switch (image.*) {
+            .Byte1, .Half1, .Float1, .Float1Sparse => 1,
+            .Byte2, .Float2 => 2,
+            .Byte3, .Half3, .Float3 => 3,
+            .Byte4, .Half4, .Float4 => 4,
         };
 
-        if (image) |i| {
-            const image_id = e.resources.images.store(e.alloc, id, i) catch {
-                return -1;
-            };
-            return @as(i32, @intCast(image_id));
-        }
+        const buffer = switch (image.*) {
+            .Float1Sparse => return -1,
+            inline else => |i| std.mem.sliceAsBytes(i.pixels),
+        };
 
-        e.alloc.free(buffer);
+        const d = image.dimensions();
+        const width: u32 = @intCast(d[0]);
+        const num_rows: u32 = @intCast(d[1] * d[2]);
 
-        return -1;
+        if (!copyImage(e, format, false, num_channels, pixel_stride, channels, width, num_rows, data, buffer)) {
+            return -1;
+        }
+
+        return 0;
     }
 
     return -1;
 }
 
-export fn su_image_update(id: u32, pixel_stride: u32, data: [*]u8) i32 {
-    if (engine) |*e| {
-        if (e.resources.images.get(id)) |image| {
-            const bpc: u32 = switch (image.*) {
-                .Byte1, .Byte2, .Byte3, .Byte4 => 1,
-                .Half1, .Half3, .Half4 => 2,
-                .Float1, .Float1Sparse, .Float2, .Float3, .Float4 => 4,
-            };
-
-            const num_channels: u32 = switch (image.*) {
-                .Byte1, .Half1, .Float1, .Float1Sparse => 1,
-                .Byte2, .Float2 => 2,
-                .Byte3, .Half3, .Float3 => 3,
-                .Byte4, .Half4, .Float4 => 4,
-            };
-
-            const bpp = bpc * num_channels;
-
-            if (bpp == pixel_stride) {
-                const buffer = switch (image.*) {
-                    .Byte1 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Byte2 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Byte3 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Byte4 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Float1 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Float2 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Float3 => |i| std.mem.sliceAsBytes(i.pixels),
-                    .Float4 => |i| std.mem.sliceAsBytes(i.pixels),
-                    else => return -1,
-                };
-
-                const num_pixels = img.Description.numPixels(image.dimensions());
-                @memcpy(buffer, data[0 .. num_pixels * bpp]);
+fn formatSize(format: Format) u32 {
+    return switch (format) {
+        .UInt8 => 1,
+        .UInt16, .Float16 => 2,
+        .UInt32, .Float32 => 4,
+    };
+}
+
+fn copyImage(
+    e: *Engine,
+    format: Format,
+    widen: bool,
+    num_channels: u32,
+    pixel_stride: u32,
+    channels: ?[*]const u32,
+    width: u32,
+    num_rows: u32,
+    source: [*]const u8,
+    destination: []u8,
+) bool {
+    const bpc = formatSize(format);
+
+    var context = CopyImageContext{
+        .format = format,
+        .widen = widen,
+        .direct = !widen and bpc * num_channels == pixel_stride,
+        .num_channels = num_channels,
+        .channels = .{ 0, 1, 2, 3 },
+        .pixel_stride = pixel_stride,
+        .width = width,
+        .source = source,
+        .destination = destination,
+    };
+
+    if (channels) |c| {
+        for (0..num_channels) |i| {
+            if (c[i] != i) {
+                context.direct = false;
             }
 
-            return 0;
+            context.channels[i] = c[i];
         }
     }
 
-    return -1;
+    // Every channel that is read has to lie within the pixel
+    for (context.channels[0..num_channels]) |c| {
+        if ((c + 1) * bpc > pixel_stride) {
+            return false;
+        }
+    }
+
+    _ = e.threads.runRange(&context, CopyImageContext.copy, 0, num_rows, 0);
+
+    return true;
 }
 
-export fn su_material_create(id: u32, string: [*:0]const u8) i32 {
-    if (engine) |*e| {
-        var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
-        defer parsed.deinit();
+const CopyImageContext = struct {
+    format: Format,
+    widen: bool,
+    direct: bool,
+    num_channels: u32,
+    channels: [4]u32,
+    pixel_stride: u32,
+    width: u32,
+    source: [*]const u8,
+    destination: []u8,
+
+    fn copy(context: Threads.Context, id: u32, begin: u32, end: u32) void {
+        _ = id;
 
-        const material = e.resources.loadData(Material, e.alloc, id, &parsed.value, .{}) catch return -1;
+        const self = @as(*CopyImageContext, @ptrCast(@alignCast(context)));
+
+        const width: u64 = self.width;
+        const stride: u64 = self.pixel_stride;
+        const bpc = formatSize(self.format);
+        const dest_bpc: u32 = if (self.widen) 4 else bpc;
+        const dest_bpp: u64 = dest_bpc * self.num_channels;
+
+        if (self.direct) {
+            const row_size = width * dest_bpp;
+            @memcpy(
+                self.destination[begin * row_size .. end * row_size],
+                self.source[begin * row_size .. end * row_size],
+            );
+            return;
+        }
 
-        return @intCast(material);
+        var p: u64 = begin * width;
+        const p_end: u64 = end * width;
+        while (p < p_end) : (p += 1) {
+            const source = self.source[p * stride ..];
+            const destination = self.destination[p * dest_bpp ..][0..dest_bpp];
+
+            for (self.channels[0..self.num_channels], 0..) |sc, dc| {
+                const s = source[sc * bpc ..][0..bpc];
+
+                if (self.widen) {
+                    const bits = std.mem.bytesToValue(u16, s[0..2]);
+                    const value: f32 = switch (self.format) {
+                        .UInt16 => @as(f32, @floatFromInt(bits)) / 65535.0,
+                        else => @floatCast(@as(f16, @bitCast(bits))),
+                    };
+
+                    @memcpy(destination[dc * 4 ..][0..4], std.mem.asBytes(&value));
+                } else {
+                    @memcpy(destination[dc * bpc ..][0..bpc], s);
+                }
+            }
+        }
     }
+};
 
-    return -1;
+export fn su_material_create(e: *Engine, id: u32, string: [*:0]const u8) i32 {
+    var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
+    defer parsed.deinit();
+
+    const material = e.resources.loadData(Material, e.alloc, id, &parsed.value, .{}) catch return -1;
+
+    return @intCast(material);
 }
 
-export fn su_material_update(id: u32, string: [*:0]const u8) i32 {
-    if (engine) |*e| {
-        var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
-        defer parsed.deinit();
+// Creates num_materials new materials at once, the descriptions are parsed in parallel.
+// ids receives the id of each material, or -1 if its description could not be parsed or loaded.
+// Returns the number of materials that were created.
+export fn su_material_create_batch(e: *Engine, num_materials: u32, strings: [*]const [*:0]const u8, ids: [*]i32) i32 {
+    // Parsing runs on the pool, which must not be building a mesh created with asyncr at the same time
+    e.resources.commitAsync();
+
+    const parsed = e.alloc.alloc(?std.json.Parsed(std.json.Value), num_materials) catch return -1;
+    defer {
+        for (parsed) |*p| {
+            if (p.*) |*v| {
+                v.deinit();
+            }
+        }
+
+        e.alloc.free(parsed);
+    }
+
+    @memset(parsed, null);
 
-        if (id >= e.resources.materials.resources.items.len) {
-            return -3;
+    var context = ParseMaterialsContext{
+        .alloc = e.alloc,
+        .strings = strings,
+        .parsed = parsed,
+    };
+
+    _ = e.threads.runRange(&context, ParseMaterialsContext.parse, 0, num_materials, 0);
+
+    // Loading touches the resource cache, which is not thread safe
+    var num_created: i32 = 0;
+    for (parsed, 0..) |*p, i| {
+        ids[i] = -1;
+
+        if (p.*) |*v| {
+            const material = e.resources.loadData(Material, e.alloc, Resources.Null, &v.value, .{}) catch continue;
+
+            ids[i] = @intCast(material);
+            num_created += 1;
         }
+    }
 
-        const material = e.resources.material(id);
+    return num_created;
+}
 
-        e.resources.materials.provider.updateMaterial(
-            e.alloc,
-            material,
-            parsed.value,
-            &e.resources,
-        ) catch return -4;
+const ParseMaterialsContext = struct {
+    alloc: Allocator,
+    strings: [*]const [*:0]const u8,
+    parsed: []?std.json.Parsed(std.json.Value),
 
-        return 0;
+    fn parse(context: Threads.Context, id: u32, begin: u32, end: u32) void {
+        _ = id;
+
+        const self = @as(*ParseMaterialsContext, @ptrCast(@alignCast(context)));
+
+        for (begin..end) |i| {
+            const string = self.strings[i];
+            self.parsed[i] = std.json.parseFromSlice(std.json.Value, self.alloc, string[0..std.mem.len(string)], .{}) catch null;
+        }
     }
+};
 
-    return -1;
+export fn su_material_update(e: *Engine, id: u32, string: [*:0]const u8) i32 {
+    var parsed = std.json.parseFromSlice(std.json.Value, e.alloc, string[0..std.mem.len(string)], .{}) catch return -1;
+    defer parsed.deinit();
+
+    if (id >= e.resources.materials.resources.items.len) {
+        return -3;
+    }
+
+    const material = e.resources.material(id);
+
+    e.resources.materials.provider.updateMaterial(
+        e.alloc,
+        material,
+        parsed.value,
+        &e.resources,
+    ) catch return -4;
+
+    return 0;
+}
+
+// Plain structs for the parameters of the most common materials.
+// They create and update materials without a detour through JSON, e.g. while tweaking values interactively.
+// Colors are sRGB like in JSON, and converted to the working color space the same way json.readColor() does.
+const SubstituteDesc = extern struct {
+    color: [3]f32,
+    roughness: f32,
+    ior: f32,
+    metallic: f32,
+    two_sided: u32,
+};
+
+const LightDesc = extern struct {
+    spectrum: [3]f32,
+    value: f32,
+    two_sided: u32,
+};
+
+const SubstituteMaterial = @FieldType(Material, "Substitute");
+const LightMaterial = @FieldType(Material, "Light");
+
+export fn su_substitute_material_create(e: *Engine, id: u32, desc: *const SubstituteDesc) i32 {
+    var material = Material{ .Substitute = .{} };
+    setSubstitute(&material.Substitute, desc.*);
+
+    return storeMaterial(e, id, &material);
+}
+
+export fn su_substitute_material_update(e: *Engine, id: u32, desc: *const SubstituteDesc) i32 {
+    const material = e.resources.materials.get(id) orelse return -3;
+
+    switch (material.*) {
+        .Substitute => |*m| setSubstitute(m, desc.*),
+        else => return -4,
+    }
+
+    material.commit(e.alloc, &e.resources) catch return -4;
+
+    return 0;
+}
+
+export fn su_light_material_create(e: *Engine, id: u32, desc: *const LightDesc) i32 {
+    var material = Material{ .Light = .{} };
+    setLight(&material.Light, desc.*);
+
+    return storeMaterial(e, id, &material);
+}
+
+export fn su_light_material_update(e: *Engine, id: u32, desc: *const LightDesc) i32 {
+    const material = e.resources.materials.get(id) orelse return -3;
+
+    switch (material.*) {
+        .Light => |*m| setLight(m, desc.*),
+        else => return -4,
+    }
+
+    material.commit(e.alloc, &e.resources) catch return -4;
+
+    return 0;
+}
+
+fn setSubstitute(material: *SubstituteMaterial, desc: SubstituteDesc) void {
+    material.color = Texture.initUniform3(spectrum.aces.sRGBtoAP1(.{ desc.color[0], desc.color[1], desc.color[2], 0.0 }));
+    material.roughness = Texture.initUniform1(desc.roughness);
+    material.ior = desc.ior;
+    material.metallic = Texture.initUniform1(desc.metallic);
+    material.super.setTwoSided(0 != desc.two_sided);
+}
+
+fn setLight(material: *LightMaterial, desc: LightDesc) void {
+    const spectrum_value = spectrum.aces.sRGBtoAP1(.{ desc.spectrum[0], desc.spectrum[1], desc.spectrum[2], 0.0 });
+    material.emittance.value = @as(Vec4f, @splat(desc.value)) * spectrum_value;
+    material.super.setTwoSided(0 != desc.two_sided);
+}
+
+fn storeMaterial(e: *Engine, id: u32, material: *Material) i32 {
+    material.commit(e.alloc, &e.resources) catch return -1;
+
+    const material_id = e.resources.materials.store(e.alloc, id, material.*) catch return -1;
+
+    return @intCast(material_id);
 }
 
 export fn su_triangle_mesh_create(
+    e: *Engine,
     id: u32,
     num_parts: u32,
     parts: ?[*]const u32,
@@ -393,281 +711,318 @@ export fn su_triangle_mesh_create(
     uvs_stride: u32,
     asyncr: bool,
 ) i32 {
-    if (engine) |*e| {
-        const desc = Resources.ShapeProvider.Descriptor{
-            .num_parts = num_parts,
-            .num_primitives = num_triangles,
-            .num_vertices = num_vertices,
-            .positions_stride = positions_stride,
-            .normals_stride = normals_stride,
-            .tangents_stride = tangents_stride,
-            .uvs_stride = uvs_stride,
-            .parts = parts,
-            .indices = indices,
-            .positions = positions,
-            .normals = normals,
-            .tangents = tangents,
-            .uvs = uvs,
-        };
-
-        const mesh_id = e.resources.loadData(Shape, e.alloc, id, &desc, .{}) catch return -1;
-
-        if (!asyncr) {
-            e.resources.commitAsync();
-        }
-
-        return @intCast(mesh_id);
+    const desc = Resources.ShapeProvider.Descriptor{
+        .num_parts = num_parts,
+        .num_primitives = num_triangles,
+        .num_vertices = num_vertices,
+        .positions_stride = positions_stride,
+        .normals_stride = normals_stride,
+        .tangents_stride = tangents_stride,
+        .uvs_stride = uvs_stride,
+        .parts = parts,
+        .indices = indices,
+        .positions = positions,
+        .normals = normals,
+        .tangents = tangents,
+        .uvs = uvs,
+    };
+
+    const mesh_id = e.resources.loadData(Shape, e.alloc, id, &desc, .{}) catch return -1;
+
+    if (!asyncr) {
+        e.resources.commitAsync();
     }
 
-    return -1;
+    return @intCast(mesh_id);
 }
 
-export fn su_prop_create(shape: u32, num_materials: u32, materials: [*]const u32) i32 {
-    if (engine) |*e| {
-        if (shape >= e.resources.shapes.resources.items.len) {
-            return -1;
-        }
+// Waits until the BVH of a mesh created with asyncr is built.
+// Not required for correctness, every call that depends on the mesh or the thread pool waits on its own.
+export fn su_triangle_mesh_commit(e: *Engine) i32 {
+    e.resources.commitAsync();
 
-        const scene_mat_len = e.resources.materials.resources.items.len;
-        const num_expected_mats = e.resources.shape(shape).numMaterials();
-        const fallback_mat = e.fallback_material;
+    return 0;
+}
 
-        var matbuf = &e.materials;
-        matbuf.ensureTotalCapacity(e.alloc, num_expected_mats) catch return -1;
-        matbuf.clearRetainingCapacity();
+export fn su_prop_create(e: *Engine, shape: u32, num_materials: u32, materials: [*]const u32) i32 {
+    if (shape >= e.resources.shapes.resources.items.len) {
+        return -1;
+    }
 
-        var i: u32 = 0;
-        while (i < num_materials) : (i += 1) {
-            const m = materials[i];
-            matbuf.appendAssumeCapacity(if (m >= scene_mat_len) fallback_mat else m);
-        }
+    const scene_mat_len = e.resources.materials.resources.items.len;
+    const num_expected_mats = e.resources.shape(shape).numMaterials();
+    const fallback_mat = e.fallback_material;
 
-        while (matbuf.items.len < num_expected_mats) {
-            matbuf.appendAssumeCapacity(fallback_mat);
-        }
+    var matbuf = &e.materials;
+    matbuf.ensureTotalCapacity(e.alloc, @max(num_expected_mats, num_materials)) catch return -1;
+    matbuf.clearRetainingCapacity();
 
-        const prop = e.scene.createPropShape(e.alloc, shape, matbuf.items, false, false) catch return -1;
+    var i: u32 = 0;
+    while (i < num_materials) : (i += 1) {
+        const m = materials[i];
+        matbuf.appendAssumeCapacity(if (m >= scene_mat_len) fallback_mat else m);
+    }
 
-        return @as(i32, @intCast(prop));
+    while (matbuf.items.len < num_expected_mats) {
+        matbuf.appendAssumeCapacity(fallback_mat);
     }
 
-    return -1;
+    const prop = e.scene.createPropShape(e.alloc, shape, matbuf.items, false, false) catch return -1;
+
+    return @as(i32, @intCast(prop));
 }
 
-export fn su_prop_create_instance(entity: u32) i32 {
-    if (engine) |*e| {
-        if (entity >= e.scene.props.items.len) {
-            return -1;
-        }
+export fn su_prop_create_instance(e: *Engine, entity: u32) i32 {
+    if (entity >= e.scene.props.items.len) {
+        return -1;
+    }
 
-        const prop = e.scene.createPropInstance(e.alloc, entity) catch return -1;
+    const prop = e.scene.createPropInstance(e.alloc, entity) catch return -1;
+
+    return @as(i32, @intCast(prop));
+}
 
-        return @as(i32, @intCast(prop));
+export fn su_prop_create_instances(
+    e: *Engine,
+    shape: u32,
+    num_materials: u32,
+    materials: [*]const u32,
+    num_instances: u32,
+    trafos: [*]const f32,
+) i32 {
+    if (0 == num_instances) {
+        return -1;
     }
 
-    return -1;
-}
+    // The instances are allocated consecutively, so the first id is enough to address all of them
+    const first = su_prop_create(e, shape, num_materials, materials);
+    if (first < 0) {
+        return first;
+    }
 
-export fn su_light_create(prop: u32) i32 {
-    if (engine) |*e| {
-        if (prop >= e.scene.props.items.len) {
-            return -1;
-        }
+    const entity: u32 = @intCast(first);
 
-        e.scene.createLight(e.alloc, prop, Prop.Null) catch return -1;
+    e.scene.prop_space.setWorldTransformation(entity, transformationFromArray(trafos[0..16]));
 
-        return 0;
+    var i: u32 = 1;
+    while (i < num_instances) : (i += 1) {
+        const prop = e.scene.createPropInstance(e.alloc, entity) catch return -1;
+
+        e.scene.prop_space.setWorldTransformation(prop, transformationFromArray(trafos[i * 16 ..][0..16]));
     }
 
-    return -1;
+    return first;
 }
 
-export fn su_prop_set_transformation(prop: u32, trafo: [*]const f32) i32 {
-    if (engine) |*e| {
-        if (prop >= e.scene.props.items.len) {
-            return -1;
-        }
-
-        const m = Mat4x4.initArray(trafo[0..16].*);
+export fn su_light_create(e: *Engine, prop: u32) i32 {
+    if (prop >= e.scene.props.items.len) {
+        return -1;
+    }
 
-        var r: Mat3x3 = undefined;
-        var t: Transformation = undefined;
-        m.decompose(&r, &t.scale, &t.position);
+    e.scene.createLight(e.alloc, prop, Prop.Null) catch return -1;
 
-        t.rotation = math.quaternion.initFromMat3x3(r);
+    return 0;
+}
 
-        e.scene.prop_space.setWorldTransformation(prop, t);
-        return 0;
+export fn su_prop_set_transformation(e: *Engine, prop: u32, trafo: [*]const f32) i32 {
+    if (prop >= e.scene.props.items.len) {
+        return -1;
     }
 
-    return -1;
+    e.scene.prop_space.setWorldTransformation(prop, transformationFromArray(trafo[0..16]));
+    return 0;
 }
 
-export fn su_prop_set_transformation_frame(prop: u32, frame: u32, trafo: [*]const f32) i32 {
-    if (engine) |*e| {
-        if (prop >= e.scene.props.items.len) {
-            return -1;
-        }
+export fn su_prop_set_transformation_frame(e: *Engine, prop: u32, frame: u32, trafo: [*]const f32) i32 {
+    if (prop >= e.scene.props.items.len) {
+        return -1;
+    }
 
-        if (frame >= e.scene.num_interpolation_frames) {
-            return -1;
-        }
+    if (frame >= e.scene.num_interpolation_frames) {
+        return -1;
+    }
 
-        if (Prop.Null == e.scene.prop_space.frames.items[prop]) {
-            e.scene.propAllocateFrames(e.alloc, prop) catch return -1;
-        }
+    if (Prop.Null == e.scene.prop_space.frames.items[prop]) {
+        e.scene.propAllocateFrames(e.alloc, prop) catch return -1;
+    }
 
-        const m = Mat4x4.initArray(trafo[0..16].*);
+    e.scene.prop_space.setFrame(prop, frame, transformationFromArray(trafo[0..16]));
+    return 0;
+}
 
-        var r: Mat3x3 = undefined;
-        var t: Transformation = undefined;
-        m.decompose(&r, &t.scale, &t.position);
+fn transformationFromArray(trafo: *const [16]f32) Transformation {
+    const m = Mat4x4.initArray(trafo.*);
 
-        t.rotation = math.quaternion.initFromMat3x3(r);
+    var r: Mat3x3 = undefined;
+    var t: Transformation = undefined;
+    m.decompose(&r, &t.scale, &t.position);
 
-        e.scene.prop_space.setFrame(prop, frame, t);
-        return 0;
-    }
+    t.rotation = math.quaternion.initFromMat3x3(r);
 
-    return -1;
+    return t;
 }
 
-export fn su_prop_set_visibility(prop: u32, in_camera: u32, in_reflection: u32, in_sss: u32) i32 {
-    if (engine) |*e| {
-        if (prop >= e.scene.props.items.len) {
-            return -1;
-        }
-
-        e.scene.propSetVisibility(prop, in_camera > 0, in_reflection > 0, in_sss > 0, false);
-        return 0;
+export fn su_prop_set_visibility(e: *Engine, prop: u32, in_camera: u32, in_reflection: u32, in_sss: u32) i32 {
+    if (prop >= e.scene.props.items.len) {
+        return -1;
     }
 
-    return -1;
+    e.scene.propSetVisibility(prop, in_camera > 0, in_reflection > 0, in_sss > 0, false);
+    return 0;
 }
 
-export fn su_render_frame(frame: u32) i32 {
-    if (engine) |*e| {
-        e.resources.commitAsync();
+export fn su_render_frame(e: *Engine, frame: u32) i32 {
+    const commit_start = chrono.now(e.io);
+    e.resources.commitAsync();
+    const commit_ns = chrono.nanosecondsSince(e.io, commit_start);
 
-        e.take.view.configure();
-        e.driver.configure(e.alloc, &e.take.view, &e.scene) catch {
-            return -1;
-        };
+    e.take.view.configure();
+    e.driver.configure(e.alloc, &e.take.view, &e.scene) catch {
+        return -1;
+    };
 
-        e.frame = frame;
+    e.frame = frame;
 
-        e.driver.render(e.alloc, e.io, 0, frame, 0, 0) catch {
-            return -1;
-        };
+    e.driver.render(e.alloc, e.io, 0, frame, 0, 0) catch {
+        return -1;
+    };
 
-        return 0;
-    }
+    e.driver.stats.commit_ns = commit_ns;
 
-    return -1;
+    return 0;
 }
 
-export fn su_export_frame() i32 {
-    if (engine) |*e| {
-        e.driver.exportFrame(e.alloc, e.io, 0, e.frame, e.take.exporters.items) catch {
-            return -1;
-        };
+export fn su_export_frame(e: *Engine) i32 {
+    e.driver.exportFrame(e.alloc, e.io, 0, e.frame, e.take.exporters.items) catch {
+        return -1;
+    };
 
-        return 0;
-    }
+    return 0;
+}
 
-    return -1;
+export fn su_start_frame(e: *Engine, frame: u32) i32 {
+    const commit_start = chrono.now(e.io);
+    e.resources.commitAsync();
+    const commit_ns = chrono.nanosecondsSince(e.io, commit_start);
+
+    e.take.view.configure();
+    e.driver.configure(e.alloc, &e.take.view, &e.scene) catch {
+        return -1;
+    };
+
+    e.frame = frame;
+    e.iteration = 0;
+    e.driver.startFrame(e.alloc, 0, frame, true) catch {
+        return -1;
+    };
+
+    e.driver.stats.commit_ns = commit_ns;
+
+    return 0;
 }
 
-export fn su_start_frame(frame: u32) i32 {
-    if (engine) |*e| {
-        e.resources.commitAsync();
+export fn su_render_iterations(e: *Engine, num_steps: u32) i32 {
+    // The threads were resized since su_start_frame
+    if (!e.driver.workersReady()) {
+        return -1;
+    }
 
-        e.take.view.configure();
-        e.driver.configure(e.alloc, &e.take.view, &e.scene) catch {
-            return -1;
-        };
+    e.driver.renderIterations(e.iteration, num_steps);
+    e.iteration += num_steps;
 
-        e.frame = frame;
-        e.iteration = 0;
-        e.driver.startFrame(e.alloc, 0, frame, true) catch {
-            return -1;
-        };
+    return 0;
+}
 
+export fn su_resolve_frame(e: *Engine, aov: u32) i32 {
+    if (aov >= core.take.View.AovValue.NumClasses) {
+        e.driver.resolve(0, 0);
         return 0;
     }
 
-    return -1;
+    return if (e.driver.resolveAov(0, @enumFromInt(aov))) 0 else -2;
 }
 
-export fn su_render_iterations(num_steps: u32) i32 {
-    if (engine) |*e| {
-        e.driver.renderIterations(e.iteration, num_steps);
-        e.iteration += num_steps;
+export fn su_resolve_frame_to_buffer(e: *Engine, aov: u32, width: u32, height: u32, buffer: [*]f32) i32 {
+    const num_pixels = @min(width * height, @as(u32, @intCast(img.Description.numPixels(e.driver.target.dimensions))));
+
+    const target: [*]Pack4f = @ptrCast(buffer);
 
+    if (aov >= core.take.View.AovValue.NumClasses) {
+        e.driver.resolveToBuffer(0, 0, target, num_pixels);
         return 0;
     }
 
-    return -1;
+    return if (e.driver.resolveAovToBuffer(0, @enumFromInt(aov), target, num_pixels)) 0 else -2;
 }
 
-export fn su_resolve_frame(aov: u32) i32 {
-    if (engine) |*e| {
-        if (aov >= core.take.View.AovValue.NumClasses) {
-            e.driver.resolve(0, 0);
-            return 0;
+// Resolves num_aovs AOVs with a single parallel pass over the pixels.
+// Buffer holds one plane of width * height RGBA pixels per AOV, in the order of aovs.
+export fn su_resolve_aovs_to_buffer(e: *Engine, num_aovs: u32, aovs: [*]const u32, width: u32, height: u32, buffer: [*]f32) i32 {
+    const NumClasses = core.take.View.AovValue.NumClasses;
+
+    if (num_aovs > NumClasses) {
+        return -2;
+    }
+
+    var classes: [NumClasses]core.take.View.AovValue.Class = undefined;
+    for (0..num_aovs) |i| {
+        if (aovs[i] >= NumClasses) {
+            return -2;
         }
 
-        return if (e.driver.resolveAov(0, @enumFromInt(aov))) 0 else -2;
+        classes[i] = @enumFromInt(aovs[i]);
     }
 
-    return -1;
-}
+    const num_pixels = width * height;
+    if (num_pixels > img.Description.numPixels(e.driver.target.dimensions)) {
+        return -1;
+    }
 
-export fn su_resolve_frame_to_buffer(aov: u32, width: u32, height: u32, buffer: [*]f32) i32 {
-    if (engine) |*e| {
-        const num_pixels = @min(width * height, @as(u32, @intCast(img.Description.numPixels(e.driver.target.dimensions))));
+    const target: [*]Pack4f = @ptrCast(buffer);
 
-        const target: [*]Pack4f = @ptrCast(buffer);
+    return if (e.driver.resolveAovsToBuffer(0, classes[0..num_aovs], target, num_pixels)) 0 else -2;
+}
 
-        if (aov >= core.take.View.AovValue.NumClasses) {
-            e.driver.resolveToBuffer(0, 0, target, num_pixels);
-            return 0;
-        }
+// Exposes the memory that su_resolve_frame resolves into, 4 floats per pixel, without copying it.
+// Dimensions receives its width and height. Starting a frame can resize the memory,
+// so it has to be queried again after su_render_frame or su_start_frame.
+export fn su_framebuffer(e: *Engine, dimensions: [*]i32, pixels: *?[*]f32) i32 {
+    const target = &e.driver.target;
+    const d = target.dimensions;
 
-        return if (e.driver.resolveAovToBuffer(0, @enumFromInt(aov), target, num_pixels)) 0 else -2;
-    }
+    dimensions[0] = d[0];
+    dimensions[1] = d[1];
 
-    return -1;
+    pixels.* = if (0 == target.pixels.len) null else @ptrCast(target.pixels.ptr);
+
+    return 0;
 }
 
 export fn su_copy_framebuffer(
+    e: *Engine,
     format: u32,
     num_channels: u32,
     width: u32,
     height: u32,
     destination: [*]u8,
 ) i32 {
-    if (engine) |*e| {
-        const bpc: u32 = if (0 == format) 1 else 4;
-
-        var context = CopyFramebufferContext{
-            .format = @enumFromInt(format),
-            .num_channels = num_channels,
-            .width = width,
-            .destination = destination[0 .. bpc * num_channels * width * height],
-            .source = e.driver.target,
-        };
+    const bpc: u32 = if (0 == format) 1 else 4;
 
-        const buffer = e.driver.target;
-        const d = buffer.dimensions;
-        const used_height = @min(height, @as(u32, @intCast(d[1])));
+    var context = CopyFramebufferContext{
+        .format = @enumFromInt(format),
+        .num_channels = num_channels,
+        .width = width,
+        .destination = destination[0 .. bpc * num_channels * width * height],
+        .source = e.driver.target,
+    };
 
-        _ = e.threads.runRange(&context, CopyFramebufferContext.copy, 0, used_height, 0);
+    const buffer = e.driver.target;
+    const d = buffer.dimensions;
+    const used_height = @min(height, @as(u32, @intCast(d[1])));
 
-        return 0;
-    }
+    _ = e.threads.runRange(&context, CopyFramebufferContext.copy, 0, used_height, 0);
 
-    return -1;
+    return 0;
 }
 
 const CopyFramebufferContext = struct {
@@ -728,11 +1083,91 @@ export fn su_register_log(post: log.CFunc.Func) i32 {
     return 0;
 }
 
-export fn su_register_progress(start: prg.CFunc.Start, tick: prg.CFunc.Tick) i32 {
-    if (engine) |*e| {
-        e.driver.progressor = .{ .CFunc = .{ .start_func = start, .tick_func = tick } };
-        return 0;
+export fn su_register_progress(e: *Engine, start: prg.CFunc.Start, tick: prg.CFunc.Tick) i32 {
+    e.driver.progressor = .{ .CFunc = .{ .start_func = start, .tick_func = tick } };
+    return 0;
+}
+
+// Counters of the frame that was last started with su_render_frame or su_start_frame, times are in seconds
+const FrameStats = extern struct {
+    commit_time: f64,
+    bvh_time: f64,
+    light_time: f64,
+    render_time: f64,
+    iteration_time: f64,
+    resolve_time: f64,
+    num_iterations: u32,
+    num_workers: u32,
+    num_rays: u64,
+    num_samples: u64,
+};
+
+const WorkerStats = extern struct {
+    busy_time: f64,
+    idle_time: f64,
+    num_rays: u64,
+    num_samples: u64,
+};
+
+fn seconds(ns: u64) f64 {
+    return @as(f64, @floatFromInt(ns)) * 1.0e-9;
+}
+
+export fn su_frame_stats(e: *Engine, stats: *FrameStats) i32 {
+    const s = e.driver.stats;
+
+    stats.* = .{
+        .commit_time = seconds(s.commit_ns),
+        .bvh_time = seconds(s.bvh_ns),
+        .light_time = seconds(s.light_ns),
+        .render_time = seconds(s.render_ns),
+        .iteration_time = seconds(s.iteration_ns),
+        .resolve_time = seconds(s.resolve_ns),
+        .num_iterations = s.num_iterations,
+        .num_workers = @intCast(e.driver.workers.len),
+        .num_rays = 0,
+        .num_samples = 0,
+    };
+
+    for (e.driver.workers) |*w| {
+        stats.num_rays += w.counters.num_rays;
+        stats.num_samples += w.counters.num_samples;
     }
 
-    return -1;
+    return 0;
+}
+
+// Fills stats for up to num_workers workers and returns how many there are, see su_frame_stats for num_workers.
+// Idle time is the part of the parallel passes a worker spent waiting for the others, a measure of load imbalance.
+export fn su_worker_stats(e: *Engine, num_workers: u32, stats: [*]WorkerStats) i32 {
+    const parallel_ns = e.driver.stats.parallel_ns;
+
+    const workers = e.driver.workers;
+    const num = @min(num_workers, workers.len);
+
+    for (workers[0..num], 0..) |*w, i| {
+        const c = w.counters;
+
+        stats[i] = .{
+            .busy_time = seconds(c.busy_ns),
+            .idle_time = seconds(parallel_ns -| c.busy_ns),
+            .num_rays = c.num_rays,
+            .num_samples = c.num_samples,
+        };
+    }
+
+    return @intCast(workers.len);
+}
+
+// Unlike the other functions this one may be called while a frame is rendering on another thread
+export fn su_progress(e: *Engine, progress: [*]u32) i32 {
+    switch (e.driver.progressor) {
+        .Counter => |*c| {
+            const p = c.get();
+            progress[0] = p[0];
+            progress[1] = p[1];
+            return 0;
+        },
+        else => return -2,
+    }
 }
@@ -68,6 +68,7 @@ pub const ImageSequence = struct {
                 .Emission => "_emission",
                 .Direct => "_direct",
                 .Indirect => "_indirect",
+                .Convergence => "_convergence",
             };
         }
 
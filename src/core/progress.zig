@@ -1,8 +1,10 @@
 const std = @import("std");
+const Atomic = std.atomic.Value;
 
 pub const Progressor = union(enum) {
     StdOut: StdOut,
     CFunc: CFunc,
+    Counter: Counter,
     Null,
 
     const Self = @This();
@@ -11,6 +13,7 @@ pub const Progressor = union(enum) {
         switch (self.*) {
             .StdOut => |*p| p.start(resolution),
             .CFunc => |p| p.start(resolution),
+            .Counter => |*p| p.start(resolution),
             .Null => {},
         }
     }
@@ -19,6 +22,7 @@ pub const Progressor = union(enum) {
         switch (self.*) {
             .StdOut => |*p| p.tick(),
             .CFunc => |p| p.tick(),
+            .Counter => |*p| p.tick(),
             .Null => {},
         }
     }
@@ -75,3 +79,25 @@ pub const CFunc = struct {
         self.tick_func();
     }
 };
+
+// Only counts, so that the progress can be polled from another thread at whatever rate suits the caller
+pub const Counter = struct {
+    resolution: Atomic(u32) = Atomic(u32).init(0),
+    progress: Atomic(u32) = Atomic(u32).init(0),
+
+    const Self = @This();
+
+    pub fn start(self: *Self, resolution: u32) void {
+        self.progress.store(0, .monotonic);
+        self.resolution.store(resolution, .release);
+    }
+
+    pub fn tick(self: *Self) void {
+        _ = self.progress.fetchAdd(1, .monotonic);
+    }
+
+    pub fn get(self: *const Self) [2]u32 {
+        const resolution = self.resolution.load(.acquire);
+        return .{ @min(self.progress.load(.monotonic), resolution), resolution };
+    }
+};
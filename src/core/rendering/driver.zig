@@ -11,6 +11,7 @@ const img = @import("../image/image.zig");
 const PhotonMap = @import("integrator/particle/photon/photon_map.zig").Map;
 const Progressor = @import("../progress.zig").Progressor;
 pub const Sensor = @import("sensor/sensor.zig").Sensor;
+pub const Stats = @import("stats.zig").Stats;
 
 const base = @import("base");
 const chrono = base.chrono;
@@ -42,7 +43,7 @@ pub const Driver = struct {
     workers: []Worker,
     photon_infos: []PhotonInfo,
 
-    tiles: TileQueue = undefined,
+    tiles: TileQueue = .{},
     ranges: RangeQueue = undefined,
 
     target: img.Float4 = .initEmpty(),
@@ -57,11 +58,16 @@ pub const Driver = struct {
 
     progressor: Progressor,
 
-    pub fn init(alloc: Allocator, threads: *Threads, progressor: Progressor) !Driver {
+    io: Io,
+
+    stats: Stats = .{},
+
+    pub fn init(alloc: Allocator, io: Io, threads: *Threads, progressor: Progressor) !Driver {
         const workers = try alloc.alloc(Worker, threads.numThreads());
         @memset(workers, .{});
 
         return Driver{
+            .io = io,
             .threads = threads,
             .workers = workers,
             .photon_infos = try alloc.alloc(PhotonInfo, threads.numThreads()),
@@ -72,6 +78,8 @@ pub const Driver = struct {
     pub fn deinit(self: *Driver, alloc: Allocator) void {
         self.target.deinit(alloc);
 
+        self.tiles.deinit(alloc);
+
         alloc.free(self.photon_infos);
 
         for (self.workers) |*w| {
@@ -87,6 +95,8 @@ pub const Driver = struct {
         self.view = view;
         self.scene = scene;
 
+        try self.resizeWorkers(alloc);
+
         const num_photons = view.photon_settings.num_photons;
         if (num_photons > 0) {
             try self.photon_map.configure(
@@ -112,6 +122,31 @@ pub const Driver = struct {
         }
     }
 
+    // The thread pool might have been resized since init
+    fn resizeWorkers(self: *Driver, alloc: Allocator) !void {
+        const num_threads = self.threads.numThreads();
+        if (num_threads == self.workers.len) {
+            return;
+        }
+
+        for (self.workers) |*w| {
+            w.deinit(alloc);
+        }
+
+        alloc.free(self.workers);
+        self.workers = &.{};
+
+        const workers = try alloc.alloc(Worker, num_threads);
+        @memset(workers, .{});
+        self.workers = workers;
+
+        self.photon_infos = try alloc.realloc(self.photon_infos, num_threads);
+    }
+
+    pub fn workersReady(self: *const Driver) bool {
+        return self.threads.numThreads() == self.workers.len;
+    }
+
     pub fn render(self: *Driver, alloc: Allocator, io: Io, camera_id: u32, frame: u32, iteration: u32, num_samples: u32) !void {
         log.info("Camera {} Frame {}", .{ camera_id, frame });
 
@@ -123,18 +158,9 @@ pub const Driver = struct {
             return Error.NoCameraProp;
         }
 
-        const dim = camera.super().resolution;
-
         const view = self.view;
 
-        try view.sensor.resize(alloc, dim, camera.numLayers(), view.aovs);
-
-        self.tiles.configure(camera.super().crop, Worker.TileDimensions, view.sensor.filter_radius_int);
-
-        try self.target.resize(alloc, img.Description.init2D(dim));
-
-        const num_particles = @as(u64, @intCast(dim[0] * dim[1])) * @as(u64, view.num_particles_per_pixel);
-        self.ranges.configure(num_particles, 0, Num_particles_per_chunk);
+        try self.prepare(alloc, camera_id);
 
         try self.startFrame(alloc, camera_id, frame, false);
 
@@ -145,26 +171,63 @@ pub const Driver = struct {
 
         self.bakePhotons(alloc, io);
 
+        const start = chrono.now(io);
+
         self.renderFrameBackward(io, camera_id);
         self.renderFrameForward(io, camera_id);
 
+        self.stats.render_ns = chrono.nanosecondsSince(io, start);
+        self.stats.iteration_ns = self.stats.render_ns / @max(self.frame_iteration_samples, 1);
+        self.stats.num_iterations = self.frame_iteration_samples;
+
         log.info("Render time {d:.3} s", .{chrono.secondsSince(io, render_start)});
     }
 
+    fn prepare(self: *Driver, alloc: Allocator, camera_id: u32) !void {
+        const camera = &self.view.cameras.items[camera_id];
+
+        const dim = camera.super().resolution;
+
+        const view = self.view;
+
+        try view.sensor.resize(alloc, dim, camera.numLayers(), view.sensorAovs());
+
+        try self.tiles.configure(alloc, camera.super().crop, Worker.TileDimensions, view.sensor.filter_radius_int);
+
+        try self.target.resize(alloc, img.Description.init2D(dim));
+
+        const num_particles = @as(u64, @intCast(dim[0] * dim[1])) * @as(u64, view.num_particles_per_pixel);
+        self.ranges.configure(num_particles, 0, Num_particles_per_chunk);
+    }
+
     pub fn startFrame(self: *Driver, alloc: Allocator, camera_id: u32, frame: u32, progressive: bool) !void {
         self.camera_id = camera_id;
         self.frame = frame;
 
+        self.stats = .{};
+
+        for (self.workers) |*w| {
+            w.counters = .{};
+        }
+
         var camera = &self.view.cameras.items[camera_id];
 
         if (Scene.Null == camera.super().entity) {
             return Error.NoCameraProp;
         }
 
+        // render() prepares the buffers itself, but progressive rendering only ever goes through here
+        if (progressive) {
+            try self.prepare(alloc, camera_id);
+        }
+
         const camera_pos = self.scene.propWorldPosition(camera.super().entity);
         const start = @as(u64, frame) * camera.super().frame_step;
 
-        try self.scene.compile(alloc, camera_pos, start);
+        try self.scene.compile(alloc, self.io, camera_pos, start);
+
+        self.stats.bvh_ns = self.scene.bvh_ns;
+        self.stats.light_ns = self.scene.light_ns;
 
         camera.update(start, self.scene);
 
@@ -175,7 +238,10 @@ pub const Driver = struct {
         if (progressive) {
             for (0..camera.numLayers()) |l| {
                 self.view.sensor.layers[l].buffer.clear(0.0);
+                self.view.sensor.layers[l].aov.clear();
             }
+
+            self.layer_id = 0;
         }
     }
 
@@ -183,10 +249,53 @@ pub const Driver = struct {
         self.frame_iteration = iteration;
         self.frame_iteration_samples = num_samples;
 
+        const start = chrono.now(self.io);
+
         self.renderFrameIterationForward();
+
+        const duration = chrono.nanosecondsSince(self.io, start);
+        self.stats.render_ns += duration;
+        self.stats.iteration_ns = duration / @max(num_samples, 1);
+        self.stats.num_iterations += num_samples;
+
+        const adaptive = self.view.adaptive_settings;
+        if (adaptive.threshold > 0.0 and iteration + num_samples >= adaptive.min_samples) {
+            self.updateConvergence(adaptive.threshold);
+        }
     }
 
+    // Marks the tiles whose pixels all reached the threshold, so that later iterations skip them
+    fn updateConvergence(self: *Driver, threshold: f32) void {
+        var context = ConvergenceContext{ .driver = self, .threshold = threshold };
+        _ = self.threads.runRange(&context, ConvergenceContext.update, 0, self.tiles.numTiles(), 0);
+
+        self.tiles.countConverged();
+    }
+
+    const ConvergenceContext = struct {
+        driver: *Driver,
+        threshold: f32,
+
+        pub fn update(context: Threads.Context, id: u32, begin: u32, end: u32) void {
+            _ = id;
+
+            const self: *ConvergenceContext = @ptrCast(@alignCast(context));
+            const driver = self.driver;
+            const tiles = &driver.tiles;
+            const sensor = &driver.view.sensor;
+
+            for (begin..end) |t| {
+                const tile_id: u32 = @intCast(t);
+                if (!tiles.converged[tile_id] and sensor.tileConverged(driver.layer_id, tiles.tile(tile_id), self.threshold)) {
+                    tiles.converged[tile_id] = true;
+                }
+            }
+        }
+    };
+
     pub fn resolveToBuffer(self: *Driver, camera_id: u32, layer_id: u32, target: [*]Pack4f, num_pixels: u32) void {
+        const start = chrono.now(self.io);
+
         const camera = self.view.cameras.items[camera_id].super();
         const resolution = camera.resolution;
         const total_crop = Vec4i{ 0, 0, resolution[0], resolution[1] };
@@ -199,6 +308,8 @@ pub const Driver = struct {
         } else {
             self.view.sensor.resolveTonemap(layer_id, target, num_pixels, self.threads);
         }
+
+        self.stats.resolve_ns = chrono.nanosecondsSince(self.io, start);
     }
 
     pub fn resolve(self: *Driver, camera_id: u32, layer_id: u32) void {
@@ -211,8 +322,34 @@ pub const Driver = struct {
             return false;
         }
 
+        const start = chrono.now(self.io);
+
         self.view.sensor.resolveAov(layer_id, class, target, num_pixels, self.threads);
 
+        self.stats.resolve_ns = chrono.nanosecondsSince(self.io, start);
+
+        return true;
+    }
+
+    pub fn resolveAovsToBuffer(
+        self: *Driver,
+        layer_id: u32,
+        classes: []const View.AovValue.Class,
+        target: [*]Pack4f,
+        num_pixels: u32,
+    ) bool {
+        for (classes) |class| {
+            if (!self.view.aovs.activeClass(class)) {
+                return false;
+            }
+        }
+
+        const start = chrono.now(self.io);
+
+        self.view.sensor.resolveAovs(layer_id, classes, target, num_pixels, self.threads);
+
+        self.stats.resolve_ns = chrono.nanosecondsSince(self.io, start);
+
         return true;
     }
 
@@ -276,7 +413,7 @@ pub const Driver = struct {
 
         self.ranges.restart(0);
 
-        self.threads.runParallel(self, renderRanges, 0);
+        self.runParallel(renderRanges);
 
         // If there will be a forward pass later...
         if (self.view.num_samples_per_pixel > 0) {
@@ -297,13 +434,30 @@ pub const Driver = struct {
         const num_samples = self.frame_iteration_samples;
         const num_expected_samples = self.view.num_samples_per_pixel;
 
-        self.workers[id].context.layer = self.layer_id;
+        const worker = &self.workers[id];
+
+        worker.context.layer = self.layer_id;
+
+        const start = chrono.now(self.io);
 
         while (self.tiles.pop()) |tile| {
-            self.workers[id].render(self.frame, tile, iteration, num_samples, num_expected_samples);
+            worker.render(self.frame, tile, iteration, num_samples, num_expected_samples);
+
+            const num_pixels: u64 = @intCast((tile[2] - tile[0] + 1) * (tile[3] - tile[1] + 1));
+            worker.counters.num_samples += num_pixels * num_samples;
 
             self.progressor.tick();
         }
+
+        worker.counters.busy_ns += chrono.nanosecondsSince(self.io, start);
+    }
+
+    fn runParallel(self: *Driver, program: anytype) void {
+        const start = chrono.now(self.io);
+
+        self.threads.runParallel(self, program, 0);
+
+        self.stats.parallel_ns += chrono.nanosecondsSince(self.io, start);
     }
 
     fn renderFrameForward(self: *Driver, io: Io, camera_id: u32) void {
@@ -329,7 +483,7 @@ pub const Driver = struct {
 
             self.tiles.restart();
 
-            self.threads.runParallel(self, renderTiles, 0);
+            self.runParallel(renderTiles);
         }
 
         log.info("Camera ray time {d:.3} s", .{chrono.secondsSince(io, start)});
@@ -344,21 +498,29 @@ pub const Driver = struct {
 
         self.tiles.restart();
 
-        self.threads.runParallel(self, renderTiles, 0);
+        self.runParallel(renderTiles);
     }
 
     fn renderRanges(context: Threads.Context, id: u32) void {
         const self: *Driver = @ptrCast(@alignCast(context));
 
+        const worker = &self.workers[id];
+
         // Just pick one layer for now
         // It should just be used for differential estimation...
-        self.workers[id].context.layer = 0;
+        worker.context.layer = 0;
+
+        const start = chrono.now(self.io);
 
         while (self.ranges.pop()) |range| {
-            self.workers[id].particles(self.frame, @as(u64, range.it), range.range);
+            worker.particles(self.frame, @as(u64, range.it), range.range);
+
+            worker.counters.num_samples += range.range[1] - range.range[0];
 
             self.progressor.tick();
         }
+
+        worker.counters.busy_ns += chrono.nanosecondsSince(self.io, start);
     }
 
     fn bakePhotons(self: *Driver, alloc: Allocator, io: Io) void {
@@ -96,7 +96,7 @@ pub const AOV = struct {
             occlusion_probe.ray = Ray.init(origin, ws, 0.0, radius);
 
             var tr: Vec4f = @splat(1.0);
-            if (worker.context.scene.visibility(occlusion_probe, sampler, worker.context, &tr)) {
+            if (worker.context.visibility(occlusion_probe, sampler, &tr)) {
                 result += num_samples_reciprocal;
             }
 
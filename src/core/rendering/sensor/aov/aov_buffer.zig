@@ -7,7 +7,8 @@ const Pack4f = math.Pack4f;
 const Vec4f = math.Vec4f;
 const spectrum = base.spectrum;
 
-const Allocator = @import("std").mem.Allocator;
+const std = @import("std");
+const Allocator = std.mem.Allocator;
 
 pub const Buffer = struct {
     slots: u32 = 0,
@@ -51,6 +52,14 @@ pub const Buffer = struct {
 
         const pixels = self.buffers[@intFromEnum(class)];
 
+        if (.Convergence == class) {
+            for (pixels[begin..end], 0..) |p, i| {
+                target[i + begin].v = Vec4f{ relativeError(p.v), p.v[2], 0.0, 1.0 };
+            }
+
+            return;
+        }
+
         const encoding = class.encoding();
         if (.Color == encoding) {
             for (pixels[begin..end], 0..) |p, i| {
@@ -102,6 +111,29 @@ pub const Buffer = struct {
         }
     }
 
+    // The Convergence slot holds the sum, the sum of squares and the number of the samples of a pixel
+    pub fn addMoment(self: *Self, id: u32, value: f32) void {
+        const pixels = self.buffers[@intFromEnum(aov.Value.Class.Convergence)];
+        pixels[id].v += Vec4f{ value, value * value, 1.0, 0.0 };
+    }
+
+    pub fn pixelError(self: *const Self, id: u32) f32 {
+        return relativeError(self.buffers[@intFromEnum(aov.Value.Class.Convergence)][id].v);
+    }
+
+    // Standard error of the pixel mean, relative to the square root of the mean to roughly follow perception
+    fn relativeError(moments: Vec4f) f32 {
+        const n = moments[2];
+        if (n < 2.0) {
+            return std.math.floatMax(f32);
+        }
+
+        const mean = moments[0] / n;
+        const variance = @max((moments[1] - moments[0] * mean) / (n - 1.0), 0.0);
+
+        return @sqrt(variance / n) / @sqrt(@max(mean, 0.0001));
+    }
+
     pub fn overwritePixel(self: *Self, id: u32, slot: u32, value: f32, weight: f32) void {
         const pixels = self.buffers[slot];
         var dest = &pixels[id];
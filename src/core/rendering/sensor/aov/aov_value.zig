@@ -17,6 +17,7 @@ pub const Value = struct {
         Emission,
         Direct,
         Indirect,
+        Convergence,
 
         pub fn default(class: Class) Vec4f {
             return switch (class) {
@@ -36,15 +37,15 @@ pub const Value = struct {
                 .Depth => .Depth,
                 .MaterialId => .Id,
                 .GeometricNormal, .ShadingNormal => .Normal,
-                .Roughness => .Float,
+                .Roughness, .Convergence => .Float,
             };
         }
     };
 
     pub const NumClasses = @typeInfo(Class).@"enum".fields.len;
 
-    // We don't need space for Emission, Direct, Indirect
-    const NumValues = NumClasses - 3;
+    // We don't need space for Emission, Direct, Indirect and Convergence
+    const NumValues = NumClasses - 4;
 
     slots: u32,
 
@@ -84,7 +85,9 @@ pub const Factory = struct {
     slots: u32 = 0,
 
     pub fn create(self: Factory) Value {
-        return .{ .slots = self.slots };
+        // Convergence is estimated by the sensor from the samples, integrators never write it
+        const bit = @as(u32, 1) << @intFromEnum(Value.Class.Convergence);
+        return .{ .slots = self.slots & ~bit };
     }
 
     pub fn activeClass(self: Factory, class: Value.Class) bool {
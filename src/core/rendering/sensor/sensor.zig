@@ -184,6 +184,10 @@ pub const Sensor = struct {
         const x = pixel[0];
         const y = pixel[1];
 
+        if (AovValue.Class.Convergence.activeIn(self.layers[layer].aov.slots)) {
+            self.addMoment(layer, pixel, math.average3(summed), bounds);
+        }
+
         const pixel_uv = sample.pixel_uv;
         const ox = pixel_uv[0] - 0.5;
         const oy = pixel_uv[1] - 0.5;
@@ -493,6 +497,38 @@ pub const Sensor = struct {
         _ = threads.runRange(&context, ResolveContext.resolveAov, 0, num_pixels, @sizeOf(Vec4f));
     }
 
+    // Resolves several AOVs in one pass over the pixels, class i into the plane starting at target + i * num_pixels
+    pub fn resolveAovs(
+        self: *const Sensor,
+        layer: u32,
+        classes: []const AovValue.Class,
+        target: [*]Pack4f,
+        num_pixels: u32,
+        threads: *Threads,
+    ) void {
+        var context = ResolveAovsContext{ .sensor = self, .target = target, .layer = layer, .classes = classes, .num_pixels = num_pixels };
+        _ = threads.runRange(&context, ResolveAovsContext.resolve, 0, num_pixels, @sizeOf(Vec4f));
+    }
+
+    const ResolveAovsContext = struct {
+        sensor: *const Sensor,
+        target: [*]Pack4f,
+        layer: u32,
+        classes: []const AovValue.Class,
+        num_pixels: u32,
+
+        pub fn resolve(context: Threads.Context, id: u32, begin: u32, end: u32) void {
+            _ = id;
+
+            const self: *const ResolveAovsContext = @ptrCast(context);
+            const aov = &self.sensor.layers[self.layer].aov;
+
+            for (self.classes, 0..) |class, i| {
+                aov.resolve(class, self.target + i * self.num_pixels, begin, end);
+            }
+        }
+    };
+
     const ResolveContext = struct {
         sensor: *const Sensor,
         target: [*]Pack4f,
@@ -541,6 +577,25 @@ pub const Sensor = struct {
         }
     };
 
+    // Whether the estimated error of every pixel in the tile is below threshold
+    pub fn tileConverged(self: *const Self, layer: u32, tile: Vec4i, threshold: f32) bool {
+        const aov = &self.layers[layer].aov;
+        const d = self.dimensions;
+
+        var y = tile[1];
+        while (y <= tile[3]) : (y += 1) {
+            var x = tile[0];
+            while (x <= tile[2]) : (x += 1) {
+                const i: u32 = @intCast(d[0] * y + x);
+                if (aov.pixelError(i) > threshold) {
+                    return false;
+                }
+            }
+        }
+
+        return true;
+    }
+
     pub fn isolatedTile(self: *const Self, tile: Vec4i) Vec4i {
         const r = self.filter_radius_int;
         return tile + Vec4i{ r, r, -r, -r };
@@ -590,6 +645,18 @@ pub const Sensor = struct {
         }
     }
 
+    fn addMoment(self: *Self, layer: u32, pixel: Vec2i, value: f32, bounds: Vec4i) void {
+        if (@as(u32, @bitCast(pixel[0] - bounds[0])) <= @as(u32, @bitCast(bounds[2])) and
+            @as(u32, @bitCast(pixel[1] - bounds[1])) <= @as(u32, @bitCast(bounds[3])))
+        {
+            const d = self.dimensions;
+            const i: u32 = @intCast(d[0] * pixel[1] + pixel[0]);
+
+            // Only the worker of the tile that contains the pixel generates its samples, no need for atomics
+            self.layers[layer].aov.addMoment(i, value);
+        }
+    }
+
     fn lessAov(self: *Self, layer: u32, pixel: Vec2i, slot: u32, value: f32, bounds: Vec4i) void {
         if (@as(u32, @bitCast(pixel[0] - bounds[0])) <= @as(u32, @bitCast(bounds[2])) and
             @as(u32, @bitCast(pixel[1] - bounds[1])) <= @as(u32, @bitCast(bounds[3])))
@@ -0,0 +1,24 @@
+// Counters of a single worker, only the thread of that worker writes them
+pub const Counters = struct {
+    num_rays: u64 = 0,
+    num_samples: u64 = 0,
+
+    // Time spent rendering tiles or ranges, the rest of a parallel pass the thread waited
+    busy_ns: u64 = 0,
+};
+
+// Where the time of the current frame went, reset by Driver.startFrame()
+pub const Stats = struct {
+    commit_ns: u64 = 0,
+    bvh_ns: u64 = 0,
+    light_ns: u64 = 0,
+    render_ns: u64 = 0,
+    resolve_ns: u64 = 0,
+
+    // Duration of a single iteration, averaged over the last call to Driver.render() or Driver.renderIterations()
+    iteration_ns: u64 = 0,
+    num_iterations: u32 = 0,
+
+    // Wall time of the parallel passes, to compare the busy time of each worker against
+    parallel_ns: u64 = 0,
+};
@@ -7,20 +7,29 @@ const Vec2f = math.Vec2f;
 const Vec4i = math.Vec4i;
 
 const std = @import("std");
+const Allocator = std.mem.Allocator;
 
 pub const TileQueue = struct {
-    crop: Vec4i,
+    crop: Vec4i = undefined,
 
-    num_tiles: Vec2i,
+    num_tiles: Vec2i = undefined,
 
-    tile_dimensions: i32,
-    filter_padding: i32,
+    tile_dimensions: i32 = undefined,
+    filter_padding: i32 = undefined,
 
-    current_consume: i32,
+    current_consume: i32 = undefined,
+
+    // Tiles marked as converged are skipped by pop()
+    converged: []bool = &.{},
+    num_converged: u32 = 0,
 
     const Self = @This();
 
-    pub fn configure(self: *Self, crop: Vec4i, tile_dimensions: i32, filter_padding: i32) void {
+    pub fn deinit(self: *Self, alloc: Allocator) void {
+        alloc.free(self.converged);
+    }
+
+    pub fn configure(self: *Self, alloc: Allocator, crop: Vec4i, tile_dimensions: i32, filter_padding: i32) !void {
         self.crop = crop;
         self.tile_dimensions = tile_dimensions;
         self.filter_padding = filter_padding;
@@ -33,54 +42,88 @@ pub const TileQueue = struct {
         self.num_tiles = @intFromFloat(@ceil(dim / tdf));
 
         self.current_consume = 0;
+
+        const num_tiles: usize = @intCast(self.num_tiles[0] * self.num_tiles[1]);
+        if (num_tiles != self.converged.len) {
+            self.converged = try alloc.realloc(self.converged, num_tiles);
+        }
+
+        @memset(self.converged, false);
+        self.num_converged = 0;
     }
 
-    pub fn size(self: Self) u32 {
+    pub fn numTiles(self: Self) u32 {
         const nt = self.num_tiles;
         return @intCast(nt[0] * nt[1]);
     }
 
+    // Number of tiles that pop() returns
+    pub fn size(self: Self) u32 {
+        return self.numTiles() - self.num_converged;
+    }
+
     pub fn restart(self: *Self) void {
         self.current_consume = 0;
     }
 
-    pub fn pop(self: *Self) ?Vec4i {
-        const current = @atomicRmw(i32, &self.current_consume, .Add, 1, .monotonic);
+    pub fn countConverged(self: *Self) void {
+        self.num_converged = 0;
+        for (self.converged) |c| {
+            self.num_converged += @intFromBool(c);
+        }
+    }
 
-        const num_tiles = self.num_tiles;
+    pub fn pop(self: *Self) ?Vec4i {
+        const num_tiles: i32 = @intCast(self.numTiles());
 
-        if (current >= num_tiles[0] * num_tiles[1]) {
-            return null;
-        }
+        while (true) {
+            const current = @atomicRmw(i32, &self.current_consume, .Add, 1, .monotonic);
 
-        const crop = self.crop;
-        const tile_dimensions = self.tile_dimensions;
+            if (current >= num_tiles) {
+                return null;
+            }
 
-        var start = gilbert.gilbert_d2xy(current, num_tiles);
+            if (self.converged[@intCast(current)]) {
+                continue;
+            }
 
-        start *= @splat(tile_dimensions);
-        start += Vec2i{ crop[0], crop[1] };
+            var result = self.tile(@intCast(current));
 
-        var end = @min(start + @as(Vec2i, @splat(tile_dimensions)), Vec2i{ crop[2], crop[3] });
+            const crop = self.crop;
+            const filter_padding = self.filter_padding;
+            if (filter_padding > 0) {
+                if (crop[1] == result[1]) {
+                    result[1] -= filter_padding;
+                }
 
-        const filter_padding = self.filter_padding;
-        if (filter_padding > 0) {
-            if (crop[1] == start[1]) {
-                start[1] -= filter_padding;
-            }
+                if (crop[3] - 1 == result[3]) {
+                    result[3] += filter_padding;
+                }
 
-            if (crop[3] == end[1]) {
-                end[1] += filter_padding;
-            }
+                if (crop[0] == result[0]) {
+                    result[0] -= filter_padding;
+                }
 
-            if (crop[0] == start[0]) {
-                start[0] -= filter_padding;
+                if (crop[2] - 1 == result[2]) {
+                    result[2] += filter_padding;
+                }
             }
 
-            if (crop[2] == end[0]) {
-                end[0] += filter_padding;
-            }
+            return result;
         }
+    }
+
+    // Pixels of tile id, without the filter padding, as start and inclusive back
+    pub fn tile(self: *const Self, id: u32) Vec4i {
+        const crop = self.crop;
+        const tile_dimensions = self.tile_dimensions;
+
+        var start = gilbert.gilbert_d2xy(@intCast(id), self.num_tiles);
+
+        start *= @splat(tile_dimensions);
+        start += Vec2i{ crop[0], crop[1] };
+
+        const end = @min(start + @as(Vec2i, @splat(tile_dimensions)), Vec2i{ crop[2], crop[3] });
 
         const back = end - @as(Vec2i, @splat(1));
         return Vec4i{ start[0], start[1], back[0], back[1] };
@@ -26,6 +26,7 @@ const PhotonSettings = @import("../take/take.zig").PhotonSettings;
 const PhotonMapper = @import("integrator/particle/photon/photon_mapper.zig").Mapper;
 const PhotonMap = @import("integrator/particle/photon/photon_map.zig").Map;
 const aov = @import("sensor/aov/aov_value.zig");
+const Counters = @import("stats.zig").Counters;
 
 const base = @import("base");
 const math = base.math;
@@ -61,6 +62,8 @@ pub const Worker = struct {
     photon_mapper: PhotonMapper = .{},
     photon_map: ?*PhotonMap = null,
 
+    counters: Counters = .{},
+
     const Self = @This();
 
     pub fn deinit(self: *Self, alloc: Allocator) void {
@@ -81,6 +84,7 @@ pub const Worker = struct {
     ) !void {
         self.sensor = sensor;
         self.context.scene = scene;
+        self.context.counters = &self.counters;
 
         self.surface_integrator = surface_integrator;
         self.lighttracer = lighttracer;
@@ -236,12 +236,14 @@ pub fn Cache(comptime T: type, comptime P: type) type {
         pub fn store(self: *Self, alloc: Allocator, id: u32, item: T) !u32 {
             if (id >= self.resources.items.len) {
                 try self.resources.append(alloc, item);
-                return @intCast(self.resources.items.len - 1);
+                self.latest_id = @intCast(self.resources.items.len - 1);
             } else {
                 self.resources.items[id].deinit(alloc);
                 self.resources.items[id] = item;
-                return id;
+                self.latest_id = id;
             }
+
+            return self.latest_id;
         }
 
         pub fn associate(self: *Self, alloc: Allocator, id: u32, name: []const u8, options: Variants) !void {
@@ -20,6 +20,7 @@ const ts = @import("../texture/texture_sampler.zig");
 const smpl = @import("../sampler/sampler.zig");
 const Sampler = smpl.Sampler;
 const VolumeIntegrator = @import("../rendering/integrator/volume/volume_integrator.zig").Integrator;
+const Counters = @import("../rendering/stats.zig").Counters;
 
 const base = @import("base");
 const math = base.math;
@@ -41,13 +42,24 @@ pub const Context = struct {
 
     layer: u32,
 
+    // Counts the rays traced through this context, if set
+    counters: ?*Counters = null,
+
     const Self = @This();
 
     pub fn intersect(self: Self, probe: *Probe, sss: bool, sampler: *Sampler, frag: *Fragment) bool {
+        if (self.counters) |c| {
+            c.num_rays += 1;
+        }
+
         return self.scene.intersect(probe, sss, sampler, frag);
     }
 
     pub fn visibility(self: Self, probe: Probe, sampler: *Sampler, tr: *Vec4f) bool {
+        if (self.counters) |c| {
+            c.num_rays += 1;
+        }
+
         return self.scene.visibility(probe, sampler, self, tr);
     }
 
@@ -30,6 +30,7 @@ const hlp = @import("../rendering/integrator/helper.zig");
 const Resources = @import("../resource/manager.zig").Manager;
 
 const base = @import("base");
+const chrono = base.chrono;
 const math = base.math;
 const AABB = math.AABB;
 const Vec2f = math.Vec2f;
@@ -40,6 +41,7 @@ const Threads = base.thread.Pool;
 
 const std = @import("std");
 const Allocator = std.mem.Allocator;
+const Io = std.Io;
 const List = std.ArrayList;
 
 pub const Scene = struct {
@@ -80,6 +82,10 @@ pub const Scene = struct {
 
     caustic_aabb: AABB = undefined,
 
+    // Durations of the last compile()
+    bvh_ns: u64 = 0,
+    light_ns: u64 = 0,
+
     props: List(Prop),
     prop_parts: List(u32),
     prop_space: Space,
@@ -182,7 +188,7 @@ pub const Scene = struct {
         return 0 == self.infinite_props.items.len;
     }
 
-    pub fn compile(self: *Scene, alloc: Allocator, camera_pos: Vec4f, time: u64) !void {
+    pub fn compile(self: *Scene, alloc: Allocator, io: Io, camera_pos: Vec4f, time: u64) !void {
         const frames_start = time - (time % TickDuration);
         self.frame_start = frames_start;
 
@@ -192,12 +198,18 @@ pub const Scene = struct {
 
         const threads = self.resources.threads;
 
+        const bvh_start = chrono.now(io);
+
         try self.bvh_builder.build(alloc, &self.solid_bvh, self.finite_props.items, self.prop_space.aabbs.items, threads);
 
         try self.bvh_builder.build(alloc, &self.unoccluding_bvh, self.unoccluding_props.items, self.prop_space.aabbs.items, threads);
 
         try self.bvh_builder.build(alloc, &self.volume_bvh, self.volume_props.items, self.prop_space.aabbs.items, threads);
 
+        self.bvh_ns = chrono.nanosecondsSince(io, bvh_start);
+
+        const light_start = chrono.now(io);
+
         const num_lights = self.lights.items.len;
         if (num_lights > self.light_temp_powers.len) {
             self.light_temp_powers = try alloc.realloc(self.light_temp_powers, num_lights);
@@ -212,6 +224,8 @@ pub const Scene = struct {
 
         try self.light_tree_builder.build(alloc, &self.light_tree, self);
 
+        self.light_ns = chrono.nanosecondsSince(io, light_start);
+
         var caustic_aabb: AABB = .empty;
         for (self.finite_props.items) |i| {
             if (self.props.items[i].caustic()) {
@@ -37,6 +37,12 @@ pub const PhotonSettings = struct {
     full_light_path: bool = false,
 };
 
+pub const AdaptiveSettings = struct {
+    // Relative error below which a pixel counts as converged, 0 disables adaptive sampling
+    threshold: f32 = 0.0,
+    min_samples: u32 = 16,
+};
+
 pub const View = struct {
     samplers: SamplerFactory = .{ .Sobol = {} },
 
@@ -72,6 +78,8 @@ pub const View = struct {
 
     photon_settings: PhotonSettings = .{},
 
+    adaptive_settings: AdaptiveSettings = .{},
+
     pub const AovValue = aov.Value;
 
     const Default_depth = Depth{ .surface = 16, .volume = 256 };
@@ -103,6 +111,16 @@ pub const View = struct {
         }
     }
 
+    // Adaptive sampling keeps the statistics of the pixels in the Convergence AOV of the sensor
+    pub fn sensorAovs(self: *const View) aov.Factory {
+        var aovs = self.aovs;
+        if (self.adaptive_settings.threshold > 0.0) {
+            aovs.set(.Convergence, true);
+        }
+
+        return aovs;
+    }
+
     pub fn loadAOV(self: *View, value: std.json.Value) void {
         var iter = value.object.iterator();
         while (iter.next()) |entry| {
@@ -124,6 +142,8 @@ pub const View = struct {
                 self.aovs.set(.Direct, json.readBool(entry.value_ptr.*));
             } else if (std.mem.eql(u8, "Indirect", entry.key_ptr.*)) {
                 self.aovs.set(.Indirect, json.readBool(entry.value_ptr.*));
+            } else if (std.mem.eql(u8, "Convergence", entry.key_ptr.*)) {
+                self.aovs.set(.Convergence, json.readBool(entry.value_ptr.*));
             }
         }
     }
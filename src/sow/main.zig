@@ -136,7 +136,7 @@ pub fn main() !void {
 
         const context = Context{ .scene = &graph.scene, .camera = &camera, .layer = 0 };
 
-        try graph.scene.compile(alloc, @splat(0.0), 0);
+        try graph.scene.compile(alloc, io, @splat(0.0), 0);
 
         var max_prototype_extent: Vec4f = @splat(0.0);
 